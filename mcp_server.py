@@ -19,8 +19,20 @@ if __name__ == "__main__":
     print("=" * 50)
     print("Starting server for Coral Protocol integration...")
     
+    run = asyncio.run
+    # The default Proactor loop on Windows spins with the sync HTTP clients used by Google APIs
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    else:
+        # libuv-backed loop: cheaper callbacks for the many small JSON-RPC messages over stdio
+        try:
+            import uvloop
+            run = uvloop.run
+        except ImportError:
+            pass
+    
     try:
-        asyncio.run(main())
+        run(main())
     except KeyboardInterrupt:
         print("\nServer stopped by user.")
     except Exception as e:
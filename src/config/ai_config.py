@@ -1,11 +1,16 @@
 """AI model configuration for Mistral - WORKING VERSION"""
 
 import os
+from functools import cache
+from typing import Union
 from mistralai import Mistral
 from dotenv import load_dotenv
 
-# Make sure to load environment variables
-load_dotenv()
+class MistralUnavailableError(RuntimeError):
+    """Raised when a completion is requested without a configured Mistral client"""
+    
+    def __init__(self, message: str = "Mistral AI service is not configured"):
+        super().__init__(message)
 
 class MistralConfig:
     """Configuration for Mistral AI integration"""
@@ -43,10 +48,30 @@ class MistralConfig:
         """Create assistant message"""
         return {"role": "assistant", "content": content}
 
-# Global instance - only create if API key exists
-try:
-    mistral_config = MistralConfig()
-    print(f"✅ Mistral initialized with model: {mistral_config.model}")
-except ValueError as e:
-    print(f"⚠️ Mistral not initialized: {e}")
-    mistral_config = None
\ No newline at end of file
+class _NullMistral:
+    """Stand-in used when MISTRAL_API_KEY is missing; completions raise MistralUnavailableError"""
+    
+    model = None
+    create_system_message = MistralConfig.create_system_message
+    create_user_message = MistralConfig.create_user_message
+    create_assistant_message = MistralConfig.create_assistant_message
+    
+    def create_chat_completion(self, messages, temperature=None, max_tokens=None):
+        """Always fails - there is no client to talk to"""
+        raise MistralUnavailableError()
+    
+    def __bool__(self):
+        return False
+
+@cache
+def get_mistral_config() -> Union[MistralConfig, _NullMistral]:
+    """Get the shared Mistral configuration, created on first use"""
+    # Make sure to load environment variables
+    load_dotenv()
+    try:
+        mistral_config = MistralConfig()
+        print(f"✅ Mistral initialized with model: {mistral_config.model}")
+        return mistral_config
+    except ValueError as e:
+        print(f"⚠️ Mistral not initialized: {e}")
+        return _NullMistral()
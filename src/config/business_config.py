@@ -1,34 +1,50 @@
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence
 import pytz
 from datetime import datetime
 
-@dataclass
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+@dataclass(slots=True)
 class BusinessConfig:
     """Configuration for different business types"""
     business_type: str  # dentist, salon, doctor, spa, lawyer
     business_name: str
     assistant_name: str
-    services: List[str]
+    services: Sequence[str]
     working_hours: Dict[str, str]  # {"monday": "08:00-17:00"}
     timezone: str = "America/New_York"
     appointment_duration: int = 60  # minutes
     buffer_time: int = 0  # minutes between appointments
     
     # Business-specific data collection
-    required_fields: List[str] = field(default_factory=list)
-    optional_fields: List[str] = field(default_factory=list)
+    required_fields: Optional[Sequence[str]] = None
+    optional_fields: Optional[Sequence[str]] = None
     
     # Google integration
     calendar_id: str = "primary"
     sheet_id: Optional[str] = None
     
+    # Joined lists for prompts and the timezone object, kept in sync by __setattr__
+    services_str: str = field(init=False, repr=False, compare=False)
+    required_fields_str: str = field(init=False, repr=False, compare=False)
+    _tz: Any = field(init=False, repr=False, compare=False)
+    
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name == "services":
+            object.__setattr__(self, "services_str", ', '.join(value))
+        elif name == "required_fields":
+            object.__setattr__(self, "required_fields_str", ', '.join(value or ()))
+        elif name == "timezone":
+            object.__setattr__(self, "_tz", pytz.timezone(value))
+    
     def __post_init__(self):
         """Set business-specific defaults"""
-        if not self.required_fields:
-            self.required_fields = self._get_default_required_fields()
-        if not self.optional_fields:
-            self.optional_fields = self._get_default_optional_fields()
+        # Stored as tuples: these lists never change once the config is built
+        self.services = tuple(self.services)
+        self.required_fields = tuple(self.required_fields or self._get_default_required_fields())
+        self.optional_fields = tuple(self.optional_fields or self._get_default_optional_fields())
 
     def get_greeting(self) -> str:
         """Generate business-appropriate greeting"""
@@ -68,8 +84,8 @@ class BusinessConfig:
     
     def get_working_hours_for_date(self, date: datetime) -> Optional[str]:
         """Get working hours for a specific date"""
-        day_name = date.strftime("%A").lower()
-        return self.working_hours.get(day_name, "")
+        # Looked up on each call so in-place edits to working_hours take effect
+        return self.working_hours.get(_WEEKDAYS[date.weekday()], "")
     
     def is_business_day(self, date: datetime) -> bool:
         """Check if the business is open on a given date"""
@@ -77,7 +93,7 @@ class BusinessConfig:
     
     def get_timezone_obj(self):
         """Get pytz timezone object"""
-        return pytz.timezone(self.timezone)
+        return self._tz
 
 # Predefined business configurations
 def create_dental_config(
@@ -1,5 +1,7 @@
 """Dental clinic specific prompts based on the provided example"""
 
+from functools import lru_cache
+
 def get_dental_system_prompt(config) -> str:
     """Enhanced dental clinic prompt based on the VAPI example"""
     
@@ -19,7 +21,7 @@ Your main role is to answer patient questions briefly, clearly, and politely reg
 You only answer what is specifically asked, unless the patient directly requests additional details.
 
 [Services]
-We offer: {', '.join(config.services)}
+We offer: {config.services_str}
 - No emergency dental treatment (refer to emergency line if needed)
 - Accept both public and private insurance
 - Wheelchair accessible facility
@@ -105,8 +107,13 @@ Closure: "Thank you for contacting {config.business_name}. Have a great day!"
 
 def _format_dental_hours(working_hours: dict) -> str:
     """Format hours in dental office style"""
+    return _format_dental_hours_cached(tuple(working_hours.items()))
+
+@lru_cache(maxsize=32)
+def _format_dental_hours_cached(working_hours: tuple) -> str:
+    """Format frozen (day, hours) pairs in dental office style"""
     formatted = []
-    for day, hours in working_hours.items():
+    for day, hours in working_hours:
         if hours:
             # Convert 24-hour to 12-hour format for dental office
             start, end = hours.split('-')
@@ -117,8 +124,10 @@ def _format_dental_hours(working_hours: dict) -> str:
             formatted.append(f"{day.capitalize()}: Closed")
     return '\n'.join(formatted)
 
+@lru_cache(maxsize=64)
 def _convert_to_12hour(time_24: str) -> str:
     """Convert 24-hour time to 12-hour format"""
-    from datetime import datetime
-    time_obj = datetime.strptime(time_24, '%H:%M')
-    return time_obj.strftime('%I:%M %p').lstrip('0')
\ No newline at end of file
+    hour, minute = time_24.split(':')
+    hour = int(hour)
+    suffix = 'AM' if hour < 12 else 'PM'
+    return f"{hour % 12 or 12}:{minute} {suffix}"
\ No newline at end of file
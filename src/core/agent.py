@@ -1,12 +1,15 @@
 """Main Universal Appointment Agent"""
 
+import asyncio
 import os
-from typing import Dict, List, Optional, Tuple
+import re
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime
+from functools import cached_property
 import pytz
 
 from ..config.business_config import BusinessConfig
-from ..config.ai_config import mistral_config
+from ..config.ai_config import MistralUnavailableError, get_mistral_config
 from ..config.prompts.base_prompts import get_base_system_prompt
 from ..config.prompts.dentist import get_dental_system_prompt
 from ..integrations.google_calendar import GoogleCalendarIntegration
@@ -14,6 +17,32 @@ from ..integrations.google_sheets import GoogleSheetsIntegration
 from ..utils.datetime_parser import DateTimeParser
 from .conversation_manager import ConversationManager, ConversationContext
 
+_CONFIRM_RE = re.compile(r'\b(?:yes|correct|confirm|book it|sounds good|perfect|right)\b', re.IGNORECASE)
+_BOOKABLE_STAGES = frozenset({'info_collection', 'confirmation'})
+
+_USER_PROMPT_TEMPLATE = """
+{context_info}
+
+Current user message: {message}
+
+Instructions:
+- Respond naturally and professionally
+- If booking appointment, check availability first
+- Collect required information: %s
+- Confirm details before final booking
+- Be helpful and conversational
+"""
+
+def _build_sheets(config: BusinessConfig) -> Optional[GoogleSheetsIntegration]:
+    """Create and set up the Sheets integration, or None if it fails"""
+    try:
+        sheets = GoogleSheetsIntegration(sheet_id=config.sheet_id)
+        sheets.setup_customer_sheet(config.business_type)
+        return sheets
+    except Exception as e:
+        print(f"⚠️ Sheets integration failed: {e}")
+        return None
+
 class UniversalAppointmentAgent:
     """Main appointment booking agent with natural conversation"""
     
@@ -22,22 +51,39 @@ class UniversalAppointmentAgent:
         self.conversation_manager = ConversationManager()
         self.datetime_parser = DateTimeParser(config.timezone)
         
-        # Initialize integrations
-        self.calendar = GoogleCalendarIntegration(
-            calendar_id=config.calendar_id
-        )
+        # Render the business prompt once; only {now} changes between turns
+        if config.business_type == 'dentist':
+            self._system_prompt_template = get_dental_system_prompt(config)
+        else:
+            self._system_prompt_template = get_base_system_prompt(config)
+        self._user_prompt_template = _USER_PROMPT_TEMPLATE % config.required_fields_str
         
-        self.sheets = None
-        if config.sheet_id:
-            try:
-                self.sheets = GoogleSheetsIntegration(sheet_id=config.sheet_id)
-                self.sheets.setup_customer_sheet(config.business_type)
-            except Exception as e:
-                print(f"⚠️ Sheets integration failed: {e}")
-                self.sheets = None
+        # Google integrations are created on first use (see calendar/sheets)
+        
+        # Background Sheets writes, awaited in aclose()
+        self._pending_writes: Set[asyncio.Task] = set()
         
         print(f"✅ Agent initialized for {config.business_name} ({config.business_type})")
     
+    @cached_property
+    def calendar(self) -> GoogleCalendarIntegration:
+        """Google Calendar integration, authenticated on first access"""
+        return GoogleCalendarIntegration(calendar_id=self.config.calendar_id)
+    
+    @cached_property
+    def sheets(self) -> Optional[GoogleSheetsIntegration]:
+        """Google Sheets integration, or None if not configured or unavailable"""
+        if not self.config.sheet_id:
+            return None
+        return _build_sheets(self.config)
+    
+    @property
+    def sheets_enabled(self) -> bool:
+        """Whether Sheets is in use, without authenticating it if not yet accessed"""
+        if 'sheets' in self.__dict__:
+            return self.sheets is not None
+        return bool(self.config.sheet_id)
+    
     async def process_message(self, message: str, session_id: str = "default") -> str:
         """
         Process user message and return agent response
@@ -49,6 +95,17 @@ class UniversalAppointmentAgent:
         Returns:
             Agent's response
         """
+        response, _ = await self._process(message, session_id)
+        return response
+    
+    async def process_message_with_status(self, message: str, session_id: str = "default") -> Tuple[str, Dict]:
+        """Process user message and return the response with the resulting conversation status"""
+        response, context = await self._process(message, session_id)
+        return response, self._conversation_status(context)
+    
+    async def _process(self, message: str, session_id: str) -> Tuple[str, Optional[ConversationContext]]:
+        """Run one conversation turn, returning the response and the session's context"""
+        context = None
         try:
             # Get or create conversation context
             context = self.conversation_manager.get_or_create_context(
@@ -58,73 +115,67 @@ class UniversalAppointmentAgent:
             )
             
             # Add user message to context
-            context.add_message('user', message)
+            user_message = context.add_message('user', message)
             
-            # Classify intent and update context
-            intent = self.conversation_manager.classify_intent(message)
-            context.current_intent = intent
+            # Classify intent and extract customer/datetime information
+            parsed = self.conversation_manager.parse_message(
+                message, context, self.datetime_parser, user_message['content_lower']
+            )
+            context.current_intent = parsed.intent
             
-            # Extract customer information
-            extracted_info = self.conversation_manager.extract_customer_info(message, context)
-            for field, value in extracted_info.items():
+            for field, value in parsed.customer_info.items():
                 context.update_customer_info(field, value)
             
-            # Extract datetime information
-            datetime_info = self.datetime_parser.extract_datetime_info(message)
+            datetime_info = parsed.datetime_info
             if datetime_info['date']:
                 context.requested_date = datetime_info['date']
             if datetime_info['time']:
                 context.requested_time = datetime_info['time']
             
-            # Process based on conversation stage and intent
-            response = await self._generate_contextual_response(context, message)
-            
-            # Handle any actions (booking, availability checking)
-            response = await self._handle_actions(context, response)
+            if self._is_pure_confirmation_turn(context, message):
+                # Everything is collected and the user just confirmed - book without the LLM
+                response = await self._complete_booking(context)
+            else:
+                # Process based on conversation stage and intent
+                response = await self._generate_contextual_response(context, message)
+                
+                # Handle any actions (booking, availability checking)
+                response = await self._handle_actions(context, response)
             
             # Add response to context
             context.add_message('assistant', response)
+            self.conversation_manager.save_context(context)
             
-            return response
+            return response, context
             
         except Exception as e:
             error_response = "I apologize, but I encountered an error. Could you please try again?"
             print(f"Agent error: {e}")
-            return error_response
+            return error_response, context
     
     async def _generate_contextual_response(self, context: ConversationContext, message: str) -> str:
         """Generate contextual response using Mistral"""
         
-        if not mistral_config:
-            return "I'm sorry, but the AI service is currently unavailable. Please try again later."
+        mistral_config = get_mistral_config()
         
         try:
             # Get business-specific system prompt
-            if context.business_type == 'dentist':
-                system_prompt = get_dental_system_prompt(self.config)
-            else:
-                system_prompt = get_base_system_prompt(self.config)
+            now = datetime.now(self.config.get_timezone_obj())
+            system_prompt = self._system_prompt_template.replace(
+                "{now}", now.isoformat(timespec='minutes')
+            )
             
             # Build contextual user message
-            context_info = self.conversation_manager.get_context_for_prompt(context.session_id)
+            context_info = self.conversation_manager.get_context_for_prompt(context)
             
-            user_prompt = f"""
-{context_info}
-
-Current user message: {message}
-
-Instructions:
-- Respond naturally and professionally
-- If booking appointment, check availability first
-- Collect required information: {', '.join(self.config.required_fields)}
-- Confirm details before final booking
-- Be helpful and conversational
-"""
+            user_prompt = self._user_prompt_template.format(
+                context_info=context_info, message=message
+            )
             
             # Create messages for Mistral
             messages = [
-                mistral_config.create_system_message(system_prompt),
-                mistral_config.create_user_message(user_prompt)
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
             ]
             
             # Get response from Mistral
@@ -133,6 +184,8 @@ Instructions:
             
             return response_text
             
+        except MistralUnavailableError:
+            return "I'm sorry, but the AI service is currently unavailable. Please try again later."
         except Exception as e:
             print(f"AI generation error: {e}")
             return "I apologize for the technical difficulty. How can I help you with your appointment?"
@@ -148,17 +201,7 @@ Instructions:
         
         # Check if we should book appointment
         if self._should_book_appointment(context, response):
-            booking_result = await self._book_appointment(context)
-            
-            if booking_result['success']:
-                context.appointment_booked = True
-                context.event_id = booking_result['event_id']
-                context.booking_confirmed = True
-                context.conversation_stage = 'completed'
-                
-                return f"{response}\n\n{booking_result['message']}"
-            else:
-                return f"I apologize, there was an issue booking your appointment: {booking_result.get('error', 'Unknown error')}. Let me help you find another time."
+            return await self._complete_booking(context, response)
         
         # Update conversation stage based on context
         self._update_conversation_stage(context)
@@ -169,7 +212,7 @@ Instructions:
         """Check availability and update context"""
         try:
             working_hours = self.config.get_working_hours_for_date(
-                datetime.strptime(context.requested_date, '%Y-%m-%d')
+                context.get_requested_date_obj()
             )
             
             if working_hours:
@@ -190,14 +233,52 @@ Instructions:
         except Exception as e:
             print(f"Availability check error: {e}")
     
+    async def _complete_booking(self, context: ConversationContext, response: str = "") -> str:
+        """Book the appointment and build the reply for the user"""
+        booking_result = await self._book_appointment(context)
+        
+        if booking_result['success']:
+            context.appointment_booked = True
+            context.event_id = booking_result['event_id']
+            context.booking_confirmed = True
+            context.conversation_stage = 'completed'
+            
+            if response:
+                return f"{response}\n\n{booking_result['message']}"
+            return booking_result['message']
+        else:
+            return f"I apologize, there was an issue booking your appointment: {booking_result.get('error', 'Unknown error')}. Let me help you find another time."
+    
+    def _is_pure_confirmation_turn(self, context: ConversationContext, message: str) -> bool:
+        """Check if this message only confirms an appointment that is ready to book"""
+        return bool(_CONFIRM_RE.search(message)) and self._ready_to_book(context)
+    
     def _should_book_appointment(self, context: ConversationContext, response: str) -> bool:
         """Determine if appointment should be booked"""
+        if not self._ready_to_book(context):
+            return False
+        
+        # Look for confirmation in the latest user message or response
+        return bool(_CONFIRM_RE.search(f"{context.last_user_message} {response}"))
+    
+    def _ready_to_book(self, context: ConversationContext) -> bool:
+        """Check every booking condition except the user's confirmation"""
+        
+        # Check the cheap booking conditions first
+        has_slot = context.selected_slot is not None
+        has_all_info = context.is_info_complete()
+        not_already_booked = not context.appointment_booked
+        
+        # Must be in appropriate conversation stage
+        appropriate_stage = context.conversation_stage in _BOOKABLE_STAGES
+        
+        if not (has_slot and has_all_info and not_already_booked and appropriate_stage):
+            return False
         
         # Validate date is not in the past
         if context.requested_date:
-            from datetime import datetime
             try:
-                requested_date = datetime.strptime(context.requested_date, '%Y-%m-%d').date()
+                requested_date = context.get_requested_date_obj().date()
                 today = datetime.now().date()
                 
                 if requested_date < today:
@@ -207,22 +288,7 @@ Instructions:
                 print(f"⚠️ Invalid date format: {context.requested_date}")
                 return False
         
-        # Check all other conditions for booking
-        has_slot = context.selected_slot is not None
-        has_all_info = context.is_info_complete()
-        not_already_booked = not context.appointment_booked
-        
-        # Look for confirmation in recent messages or response
-        recent_messages = [msg['content'].lower() for msg in context.messages[-2:] if msg['role'] == 'user']
-        confirmation_words = ['yes', 'correct', 'confirm', 'book it', 'sounds good', 'perfect', 'right']
-        has_confirmation = any(word in ' '.join(recent_messages + [response.lower()]) 
-                            for word in confirmation_words)
-        
-        # Must be in appropriate conversation stage
-        appropriate_stage = context.conversation_stage in ['info_collection', 'confirmation']
-        
-        return (has_slot and has_all_info and not_already_booked and 
-                has_confirmation and appropriate_stage)
+        return True
     
     async def _book_appointment(self, context: ConversationContext) -> Dict:
         """Book the appointment"""
@@ -243,15 +309,14 @@ Instructions:
             )
             
             if booking_result['success']:
-                # Store customer data in sheets
-                if self.sheets:
-                    self.sheets.store_customer_data(
-                        context.customer_info,
-                        {
-                            'date': context.requested_date,
-                            'time': context.selected_slot
-                        }
-                    )
+                # Store customer data in sheets without holding up the confirmation
+                self.store_customer_data_in_background(
+                    dict(context.customer_info),
+                    {
+                        'date': context.requested_date,
+                        'time': context.selected_slot
+                    }
+                )
                 
                 return {
                     'success': True,
@@ -267,6 +332,34 @@ Instructions:
                 'error': str(e)
             }
     
+    def store_customer_data_in_background(self, customer_info: Dict, appointment_info: Dict):
+        """Schedule a Sheets write for a booked appointment; failures are logged, not raised"""
+        if not self.config.sheet_id:
+            return
+        
+        task = asyncio.create_task(
+            asyncio.to_thread(self._store_customer_data, customer_info, appointment_info)
+        )
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+    
+    def _store_customer_data(self, customer_info: Dict, appointment_info: Dict):
+        """Write customer data to Sheets (runs in a worker thread)"""
+        try:
+            if self.sheets:
+                self.sheets.store_customer_data(customer_info, appointment_info)
+        except Exception as e:
+            print(f"⚠️ Failed to store customer data: {e}")
+    
+    async def aclose(self):
+        """Wait for background Sheets writes to finish and flush any batched rows"""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+        # Only flush a Sheets client that was actually created
+        sheets = self.__dict__.get('sheets')
+        if sheets:
+            await asyncio.to_thread(sheets.flush)
+    
     def _update_conversation_stage(self, context: ConversationContext):
         """Update conversation stage based on context"""
         
@@ -293,10 +386,14 @@ Instructions:
     
     def get_conversation_status(self, session_id: str = "default") -> Dict:
         """Get current conversation status"""
-        if session_id not in self.conversation_manager.contexts:
+        return self._conversation_status(self.conversation_manager.get_context(session_id))
+    
+    @staticmethod
+    def _conversation_status(context: Optional[ConversationContext]) -> Dict:
+        """Summarize a conversation context as a status dict"""
+        if context is None:
             return {'status': 'new', 'context': None}
         
-        context = self.conversation_manager.contexts[session_id]
         return {
             'status': context.conversation_stage,
             'context': context.get_context_summary(),
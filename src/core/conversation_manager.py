@@ -1,23 +1,90 @@
 """Conversation context and state management"""
 
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, List, Optional, Any, Protocol, Set, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
+from collections import OrderedDict, deque
 import json
+import re
 
-@dataclass
+from ..utils.datetime_parser import DateTimeParser
+
+# Bounds for in-memory conversation state
+MAX_SESSIONS = 1000
+MAX_MESSAGES = 32
+PROMPT_HISTORY = 4  # messages included in the AI prompt
+
+# Customer info patterns; each alternation is one regex pass and the leftmost match wins
+_PHONE_RE = re.compile(
+    r'(?P<intl>\+\d{1,3}[-.\s]?\d{3,4}[-.\s]?\d{3,4}[-.\s]?\d{3,4})'  # International
+    r'|(?P<us>\d{3}[-.\s]?\d{3}[-.\s]?\d{4})'  # US format, including 10 plain digits
+)
+
+_NAME_PATTERNS = tuple(re.compile(p) for p in (
+    r'my name is ([a-zA-Z\s]+)',
+    r'i\'m ([a-zA-Z\s]+)',
+    r'this is ([a-zA-Z\s]+)',
+    r'call me ([a-zA-Z\s]+)'
+))
+
+_DOB_RE = re.compile(
+    r'(?P<slash>\d{1,2}/\d{1,2}/\d{4})'
+    r'|(?P<dash>\d{1,2}-\d{1,2}-\d{4})'
+    r'|(?P<month_first>(?:january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2},?\s+\d{4})'
+    r'|(?P<day_first>\d{1,2}[a-z]{0,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{4})'
+)
+
+# Intent keywords in priority order; the first intent with any keyword in the message wins.
+# Within an intent, the most common keywords come first so the alternation tries them first
+_INTENT_KEYWORDS = (
+    # Appointment booking intents
+    ('book_appointment', ('book', 'appointment', 'schedule', 'reserve')),
+    # Modification intents
+    ('modify_appointment', ('cancel', 'reschedule', 'change', 'modify')),
+    # Information requests
+    ('hours_inquiry', ('time', 'when', 'open', 'hours', 'closed')),
+    ('services_inquiry', ('services', 'offer', 'what do you', 'treatments')),
+    ('pricing_inquiry', ('cost', 'price', 'how much', 'payment')),
+    # Confirmation responses
+    ('confirmation', ('yes', 'right', 'correct', 'perfect', 'sounds good', 'confirm')),
+    ('rejection', ('no', 'wrong', 'not right', 'incorrect')),
+    # Greetings
+    ('greeting', ('hi', 'hello', 'hey', 'good morning', 'good afternoon')),
+)
+
+# One alternation per intent; plain substring matches, like the keyword checks they replace
+_INTENT_PATTERNS = tuple(
+    (intent, re.compile('|'.join(map(re.escape, keywords))))
+    for intent, keywords in _INTENT_KEYWORDS
+)
+
+@lru_cache(maxsize=2048)
+def _classify_intent_cached(message_lower: str) -> str:
+    """Classify a lowercased message; short replies like "yes" or "hi" repeat constantly"""
+    for intent, pattern in _INTENT_PATTERNS:
+        if pattern.search(message_lower):
+            return intent
+    
+    return 'general_inquiry'
+
+@dataclass(slots=True)
 class ConversationContext:
     """Tracks conversation state and customer information"""
     session_id: str
     business_type: str
     
     # Conversation tracking
-    messages: List[Dict[str, str]] = field(default_factory=list)
+    messages: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=MAX_MESSAGES))
+    _recent: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=PROMPT_HISTORY),
+                                           init=False, repr=False, compare=False)
+    last_user_message: str = ""
     current_intent: Optional[str] = None
     conversation_stage: str = "greeting"  # greeting, scheduling, info_collection, confirmation, completed
     
     # Appointment details
     requested_date: Optional[str] = None
+    _requested_date_cache: Optional[Tuple[str, datetime]] = field(default=None, init=False, repr=False, compare=False)
     requested_time: Optional[str] = None
     available_slots: List[str] = field(default_factory=list)
     selected_slot: Optional[str] = None
@@ -26,6 +93,8 @@ class ConversationContext:
     customer_info: Dict[str, str] = field(default_factory=dict)
     required_fields: List[str] = field(default_factory=list)
     collected_fields: List[str] = field(default_factory=list)
+    # Required fields still without a value, kept in sync by update_customer_info
+    _missing_fields: Set[str] = field(init=False, repr=False, compare=False)
     
     # Booking status
     appointment_booked: bool = False
@@ -36,31 +105,54 @@ class ConversationContext:
     created_at: datetime = field(default_factory=datetime.now)
     last_updated: datetime = field(default_factory=datetime.now)
     
-    def add_message(self, role: str, content: str):
+    def __post_init__(self):
+        self._missing_fields = set(self.required_fields)
+    
+    def add_message(self, role: str, content: str) -> Dict[str, Any]:
         """Add a message to conversation history"""
-        self.messages.append({
+        now = datetime.now()
+        message = {
             'role': role,
             'content': content,
-            'timestamp': datetime.now().isoformat()
-        })
-        self.last_updated = datetime.now()
+            'content_lower': content.lower(),
+            'timestamp': now.timestamp()
+        }
+        self.messages.append(message)
+        self._recent.append(message)
+        if role == 'user':
+            self.last_user_message = content
+        self.last_updated = now
+        return message
+    
+    def get_requested_date_obj(self) -> Optional[datetime]:
+        """Get requested_date as a datetime, parsing it only when it changes"""
+        if not self.requested_date:
+            return None
+        cached = self._requested_date_cache
+        if cached is None or cached[0] != self.requested_date:
+            cached = (self.requested_date, datetime.strptime(self.requested_date, '%Y-%m-%d'))
+            self._requested_date_cache = cached
+        return cached[1]
     
     def update_customer_info(self, field: str, value: str):
         """Update customer information"""
         if value and value.strip():
-            self.customer_info[field] = value.strip()
-            if field not in self.collected_fields:
+            # customer_info only gains keys here, so it doubles as the collected set
+            if field not in self.customer_info:
                 self.collected_fields.append(field)
+            self.customer_info[field] = value.strip()
+            self._missing_fields.discard(field)
             self.last_updated = datetime.now()
     
     def get_missing_fields(self) -> List[str]:
         """Get list of required fields that haven't been collected"""
-        return [field for field in self.required_fields 
-                if field not in self.collected_fields or not self.customer_info.get(field)]
+        if not self._missing_fields:
+            return []
+        return [field for field in self.required_fields if field in self._missing_fields]
     
     def is_info_complete(self) -> bool:
         """Check if all required information has been collected"""
-        return len(self.get_missing_fields()) == 0
+        return not self._missing_fields
     
     def get_context_summary(self) -> str:
         """Get a summary of the current conversation context"""
@@ -86,135 +178,156 @@ class ConversationContext:
         
         return " | ".join(summary_parts) if summary_parts else "New conversation"
 
+@dataclass(slots=True)
+class ParsedMessage:
+    """Everything extracted from a single user message"""
+    intent: str
+    customer_info: Dict[str, str]
+    datetime_info: Dict[str, Optional[str]]
+
+class ContextStore(Protocol):
+    """Where ConversationManager keeps contexts; swap in a shared store to scale out"""
+    
+    def get(self, session_id: str) -> Optional[ConversationContext]: ...
+    
+    def put(self, session_id: str, context: ConversationContext) -> None: ...
+    
+    def delete(self, session_id: str) -> None: ...
+    
+    def __len__(self) -> int: ...
+
+class InMemoryContextStore:
+    """Process-local context store that evicts the least recently used sessions"""
+    
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.contexts: "OrderedDict[str, ConversationContext]" = OrderedDict()
+        self.max_sessions = max_sessions
+    
+    def get(self, session_id: str) -> Optional[ConversationContext]:
+        """Get a context, marking it as recently used"""
+        context = self.contexts.get(session_id)
+        if context is not None:
+            self.contexts.move_to_end(session_id)
+        return context
+    
+    def put(self, session_id: str, context: ConversationContext) -> None:
+        """Store a context, evicting the oldest sessions past max_sessions"""
+        self.contexts[session_id] = context
+        self.contexts.move_to_end(session_id)
+        while len(self.contexts) > self.max_sessions:
+            self.contexts.popitem(last=False)
+    
+    def delete(self, session_id: str) -> None:
+        """Remove a context if present"""
+        self.contexts.pop(session_id, None)
+    
+    def __len__(self) -> int:
+        return len(self.contexts)
+
 class ConversationManager:
     """Manages multiple conversation contexts"""
     
-    def __init__(self):
-        self.contexts: Dict[str, ConversationContext] = {}
+    def __init__(self, max_sessions: int = MAX_SESSIONS, store: Optional[ContextStore] = None):
+        self.store: ContextStore = store if store is not None else InMemoryContextStore(max_sessions)
+    
+    def get_context(self, session_id: str) -> Optional[ConversationContext]:
+        """Get existing context, marking it as recently used"""
+        return self.store.get(session_id)
     
     def get_or_create_context(self, session_id: str, business_type: str, 
                             required_fields: List[str]) -> ConversationContext:
         """Get existing context or create new one"""
-        if session_id not in self.contexts:
-            self.contexts[session_id] = ConversationContext(
+        context = self.store.get(session_id)
+        if context is None:
+            context = ConversationContext(
                 session_id=session_id,
                 business_type=business_type,
                 required_fields=required_fields
             )
+            self.store.put(session_id, context)
         
-        return self.contexts[session_id]
+        return context
+    
+    def save_context(self, context: ConversationContext):
+        """Write a modified context back to the store"""
+        self.store.put(context.session_id, context)
     
     def update_context_stage(self, session_id: str, stage: str):
         """Update conversation stage"""
-        if session_id in self.contexts:
-            self.contexts[session_id].conversation_stage = stage
-            self.contexts[session_id].last_updated = datetime.now()
+        context = self.store.get(session_id)
+        if context is not None:
+            context.conversation_stage = stage
+            context.last_updated = datetime.now()
+            self.store.put(session_id, context)
+    
+    def parse_message(self, message: str, context: ConversationContext,
+                      datetime_parser: DateTimeParser,
+                      message_lower: Optional[str] = None) -> ParsedMessage:
+        """Classify intent and extract customer and date/time info in one call"""
+        if message_lower is None:
+            message_lower = message.lower()
+        return ParsedMessage(
+            intent=self._classify_intent(message_lower),
+            customer_info=self._extract_customer_info(message, message_lower, context),
+            datetime_info=datetime_parser.extract_datetime_info(message)
+        )
     
     def classify_intent(self, message: str) -> str:
         """Classify user intent from message"""
-        message_lower = message.lower()
-        
-        # Appointment booking intents
-        if any(word in message_lower for word in ['appointment', 'book', 'schedule', 'reserve']):
-            return 'book_appointment'
-        
-        # Modification intents
-        if any(word in message_lower for word in ['cancel', 'reschedule', 'change', 'modify']):
-            return 'modify_appointment'
-        
-        # Information requests
-        if any(word in message_lower for word in ['hours', 'open', 'closed', 'when', 'time']):
-            return 'hours_inquiry'
-        
-        if any(word in message_lower for word in ['services', 'what do you', 'offer', 'treatments']):
-            return 'services_inquiry'
-        
-        if any(word in message_lower for word in ['price', 'cost', 'how much', 'payment']):
-            return 'pricing_inquiry'
-        
-        # Confirmation responses
-        if any(word in message_lower for word in ['yes', 'correct', 'right', 'confirm', 'sounds good', 'perfect']):
-            return 'confirmation'
-        
-        if any(word in message_lower for word in ['no', 'not right', 'wrong', 'incorrect']):
-            return 'rejection'
-        
-        # Greetings
-        if any(word in message_lower for word in ['hello', 'hi', 'hey', 'good morning', 'good afternoon']):
-            return 'greeting'
-        
-        return 'general_inquiry'
+        return self._classify_intent(message.lower())
+    
+    def _classify_intent(self, message_lower: str) -> str:
+        """Classify intent from an already lowercased message"""
+        return _classify_intent_cached(message_lower)
     
     def extract_customer_info(self, message: str, context: ConversationContext) -> Dict[str, str]:
         """Extract customer information from message"""
-        import re
-        
+        return self._extract_customer_info(message, message.lower(), context)
+    
+    def _extract_customer_info(self, message: str, message_lower: str,
+                               context: ConversationContext) -> Dict[str, str]:
+        """Extract customer information given the original and lowercased message"""
         extracted = {}
-        message_lower = message.lower()
         
         # Extract phone numbers
-        phone_patterns = [
-            r'(\d{3}[-.\s]?\d{3}[-.\s]?\d{4})',  # US format
-            r'(\d{10})',  # 10 digits
-            r'(\+\d{1,3}[-.\s]?\d{3,4}[-.\s]?\d{3,4}[-.\s]?\d{3,4})'  # International
-        ]
-        
-        for pattern in phone_patterns:
-            match = re.search(pattern, message.replace(' ', ''))
-            if match and 'phone' not in context.customer_info:
-                extracted['phone'] = match.group(1)
-                break
+        if 'phone' not in context.customer_info:
+            match = _PHONE_RE.search(message)
+            if match:
+                extracted['phone'] = match.group(match.lastgroup).replace(' ', '')
         
         # Extract names (when explicitly mentioned)
-        name_patterns = [
-            r'my name is ([a-zA-Z\s]+)',
-            r'i\'m ([a-zA-Z\s]+)',
-            r'this is ([a-zA-Z\s]+)',
-            r'call me ([a-zA-Z\s]+)'
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, message_lower)
-            if match and 'name' not in context.customer_info:
-                name = match.group(1).strip()
-                if len(name.split()) <= 3 and name.replace(' ', '').isalpha():
-                    extracted['name'] = name.title()
-                break
+        if 'name' not in context.customer_info:
+            for pattern in _NAME_PATTERNS:
+                match = pattern.search(message_lower)
+                if match:
+                    name = match.group(1).strip()
+                    if len(name.split()) <= 3 and name.replace(' ', '').isalpha():
+                        extracted['name'] = name.title()
+                    break
         
         # Extract date of birth
-        dob_patterns = [
-            r'(\d{1,2}/\d{1,2}/\d{4})',
-            r'(\d{1,2}-\d{1,2}-\d{4})',
-            r'(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2},?\s+\d{4}',
-            r'(\d{1,2}[a-z]{0,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{4})'
-        ]
-        
-        for pattern in dob_patterns:
-            match = re.search(pattern, message_lower)
-            if match and 'date_of_birth' not in context.customer_info:
-                extracted['date_of_birth'] = match.group(1)
-                break
+        if 'date_of_birth' not in context.customer_info:
+            match = _DOB_RE.search(message_lower)
+            if match:
+                extracted['date_of_birth'] = match.group(match.lastgroup)
         
         return extracted
     
     def reset_context(self, session_id: str):
         """Reset conversation context"""
-        if session_id in self.contexts:
-            del self.contexts[session_id]
+        self.store.delete(session_id)
     
-    def get_context_for_prompt(self, session_id: str) -> str:
-        """Get formatted context for AI prompt"""
-        if session_id not in self.contexts:
+    def get_context_for_prompt(self, context: Optional[ConversationContext]) -> str:
+        """Get formatted context for AI prompt from the live (possibly unsaved) context"""
+        if context is None:
             return "New conversation"
         
-        context = self.contexts[session_id]
-        
         prompt_parts = []
         
         # Recent conversation history
         if context.messages:
             prompt_parts.append("Recent conversation:")
-            for msg in context.messages[-4:]:  # Last 4 messages
+            for msg in context._recent:  # Last PROMPT_HISTORY messages
                 prompt_parts.append(f"{msg['role']}: {msg['content']}")
             prompt_parts.append("")
         
@@ -226,8 +339,13 @@ class ConversationManager:
         
         # Available slots if relevant
         if context.available_slots and not context.selected_slot:
-            morning_slots = [s for s in context.available_slots if int(s.split(':')[0]) < 12]
-            afternoon_slots = [s for s in context.available_slots if int(s.split(':')[0]) >= 12]
+            # Only the first three of each are shown, so stop once both are full.
+            # Slots are zero-padded "HH:MM-HH:MM", so the hour compares as a string
+            morning_slots, afternoon_slots = [], []
+            for slot in context.available_slots:
+                (morning_slots if slot[:2] < '12' else afternoon_slots).append(slot)
+                if len(morning_slots) >= 3 and len(afternoon_slots) >= 3:
+                    break
             
             if morning_slots:
                 prompt_parts.append(f"Morning slots: {', '.join(morning_slots[:3])}")
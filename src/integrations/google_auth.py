@@ -0,0 +1,59 @@
+"""Shared OAuth and service construction for Google API integrations"""
+
+import os
+import pickle
+from functools import lru_cache
+from typing import Optional, Tuple
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+
+def _migrate_pickle_token(token_file: str) -> Optional[Credentials]:
+    """Convert a token saved as a pickle by earlier versions, so installs skip the consent flow"""
+    pickle_file = os.path.splitext(token_file)[0] + '.pickle'
+    if not os.path.exists(pickle_file):
+        return None
+    
+    with open(pickle_file, 'rb') as token:
+        creds = pickle.load(token)
+    with open(token_file, 'w') as token:
+        token.write(creds.to_json())
+    return creds
+
+@lru_cache(maxsize=8)
+def get_service(api_name: str, api_version: str, credentials_file: Optional[str],
+                token_file: str, scopes: Tuple[str, ...]):
+    """Authenticate and build a Google API service, reused across integration instances"""
+    creds = None
+    
+    # Load existing token
+    if os.path.exists(token_file):
+        creds = Credentials.from_authorized_user_file(token_file, list(scopes))
+    else:
+        creds = _migrate_pickle_token(token_file)
+    
+    # If no valid credentials, get new ones
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            if not credentials_file or not os.path.exists(credentials_file):
+                raise ValueError(
+                    "Google credentials file not found. "
+                    "Please download credentials.json from Google Cloud Console "
+                    "and set GOOGLE_CREDENTIALS_FILE in .env"
+                )
+                
+            flow = InstalledAppFlow.from_client_secrets_file(
+                credentials_file, list(scopes)
+            )
+            creds = flow.run_local_server(port=8080)
+            
+        # Save credentials for next run
+        with open(token_file, 'w') as token:
+            token.write(creds.to_json())
+    
+    # Discovery documents ship with the client library; skip the fetch and the file cache
+    return build(api_name, api_version, credentials=creds,
+                 cache_discovery=False, static_discovery=True)
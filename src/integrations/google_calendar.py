@@ -1,22 +1,34 @@
 """Google Calendar integration for appointment booking"""
 
 import os
-import pickle
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
 from typing import List, Dict, Optional, Tuple
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import pytz
 from dotenv import load_dotenv
 
+from .google_auth import get_service
+from ..utils.datetime_parser import parse_ymd
+
 load_dotenv()
 
 # Scopes for Google Calendar API
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+def _tz(name: str) -> ZoneInfo:
+    """Timezone lookup; ZoneInfo keeps its own cache of instances"""
+    return ZoneInfo(name)
+
+def _format_minutes(minutes: int) -> str:
+    """Format minutes since midnight as HH:MM, wrapping past midnight like a wall clock"""
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+@lru_cache(maxsize=256)
+def _parse_hm(value: str) -> time:
+    """Parse an HH:MM string, caching repeated times"""
+    return datetime.strptime(value, '%H:%M').time()
+
 class GoogleCalendarIntegration:
     """Google Calendar integration for appointment management"""
     
@@ -28,36 +40,9 @@ class GoogleCalendarIntegration:
     
     def _authenticate(self):
         """Authenticate with Google Calendar API"""
-        creds = None
-        token_file = 'token.pickle'
-        
-        # Load existing token
-        if os.path.exists(token_file):
-            with open(token_file, 'rb') as token:
-                creds = pickle.load(token)
-        
-        # If no valid credentials, get new ones
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                if not self.credentials_file or not os.path.exists(self.credentials_file):
-                    raise ValueError(
-                        "Google credentials file not found. "
-                        "Please download credentials.json from Google Cloud Console "
-                        "and set GOOGLE_CREDENTIALS_FILE in .env"
-                    )
-                
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_file, SCOPES
-                )
-                creds = flow.run_local_server(port=8080)
-            
-            # Save credentials for next run
-            with open(token_file, 'wb') as token:
-                pickle.dump(creds, token)
-        
-        self.service = build('calendar', 'v3', credentials=creds)
+        self.service = get_service(
+            'calendar', 'v3', self.credentials_file, 'token.json', tuple(SCOPES)
+        )
         print("✅ Google Calendar authenticated successfully")
     
     def get_available_slots(self, date: str, working_hours: str, duration_minutes: int, timezone: str = "America/New_York") -> List[str]:
@@ -74,73 +59,16 @@ class GoogleCalendarIntegration:
             List of available slots in "HH:MM-HH:MM" format
         """
         try:
-            if not working_hours:
+            window = self._get_booking_window(date, working_hours, timezone)
+            if not window:
                 return []
             
-            # Check if date is in the past
-            from datetime import datetime, date as dt_date
-            requested_date = datetime.strptime(date, '%Y-%m-%d').date()
-            today = datetime.now().date()
-            
-            if requested_date < today:
-                print(f"⚠️ Requested date {date} is in the past")
-                return []
-            
-            # Parse working hours
-            start_hour, end_hour = working_hours.split('-')
-            tz = pytz.timezone(timezone)
-            
-            # Create start and end datetime objects
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            start_time = tz.localize(datetime.combine(
-                date_obj.date(),
-                datetime.strptime(start_hour, '%H:%M').time()
-            ))
-            end_time = tz.localize(datetime.combine(
-                date_obj.date(), 
-                datetime.strptime(end_hour, '%H:%M').time()
-            ))
-            
-            # If it's today, don't allow appointments in the past
-            if requested_date == today:
-                current_time = datetime.now(tz)
-                if start_time < current_time:
-                    # Round up to next hour
-                    next_hour = current_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-                    if next_hour < end_time:
-                        start_time = next_hour
-                    else:
-                        return []  # No available slots today
-            
             # Get existing events for the day
             events = self._get_events_for_date(date, timezone)
             
             print(f"Found {len(events)} existing appointments for {date}")
             
-            # Generate available slots
-            available_slots = []
-            current_time = start_time
-            
-            while current_time + timedelta(minutes=duration_minutes) <= end_time:
-                slot_end = current_time + timedelta(minutes=duration_minutes)
-                
-                # Check if slot conflicts with existing events
-                is_available = True
-                for event in events:
-                    event_start = event['start']
-                    event_end = event['end']
-                    
-                    # Check for overlap (more strict checking)
-                    if (current_time < event_end and slot_end > event_start):
-                        is_available = False
-                        print(f"Slot {current_time.strftime('%H:%M')}-{slot_end.strftime('%H:%M')} conflicts with existing appointment")
-                        break
-                
-                if is_available:
-                    slot_str = f"{current_time.strftime('%H:%M')}-{slot_end.strftime('%H:%M')}"
-                    available_slots.append(slot_str)
-                
-                current_time += timedelta(minutes=duration_minutes)
+            available_slots = self._generate_free_slots(*window, duration_minutes, events)
             
             print(f"Found {len(available_slots)} available slots for {date}")
             return available_slots
@@ -149,48 +77,100 @@ class GoogleCalendarIntegration:
             print(f"Error getting available slots: {e}")
             return []
     
-    def _get_events_for_date(self, date: str, timezone: str) -> List[Dict]:
-        """Get all events for a specific date"""
-        try:
-            tz = pytz.timezone(timezone)
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            
-            # Start and end of the day
-            day_start = tz.localize(datetime.combine(date_obj.date(), datetime.min.time()))
-            day_end = tz.localize(datetime.combine(date_obj.date(), datetime.max.time()))
-            
-            events_result = self.service.events().list(
-                calendarId=self.calendar_id,
-                timeMin=day_start.isoformat(),
-                timeMax=day_end.isoformat(),
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-            
-            events = events_result.get('items', [])
+    def _get_booking_window(self, date: str, working_hours: str, timezone: str) -> Optional[Tuple[datetime, datetime]]:
+        """Get the bookable (start, end) for a date, or None if closed or already past"""
+        if not working_hours:
+            return None
+        
+        # Check if date is in the past
+        requested_date = parse_ymd(date)
+        today = datetime.now().date()
+        
+        if requested_date < today:
+            print(f"⚠️ Requested date {date} is in the past")
+            return None
+        
+        # Parse working hours
+        start_hour, end_hour = working_hours.split('-')
+        tz = _tz(timezone)
+        
+        # Create start and end datetime objects
+        start_time = datetime.combine(requested_date, _parse_hm(start_hour), tzinfo=tz)
+        end_time = datetime.combine(requested_date, _parse_hm(end_hour), tzinfo=tz)
+        
+        # If it's today, don't allow appointments in the past
+        if requested_date == today:
+            current_time = datetime.now(tz)
+            if start_time < current_time:
+                # Round up to next hour
+                next_hour = current_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+                if next_hour < end_time:
+                    start_time = next_hour
+                else:
+                    return None  # No available slots today
+        
+        return start_time, end_time
+    
+    @staticmethod
+    def _generate_free_slots(start_time: datetime, end_time: datetime, duration_minutes: int,
+                             events: List[Dict]) -> List[str]:
+        """Generate back-to-back slots between start and end that don't overlap any event"""
+        # Work in integer minutes since the start of the business day
+        start_min = start_time.hour * 60 + start_time.minute
+        origin = start_time.timestamp() - start_min * 60
+        end_min = int((end_time.timestamp() - origin) // 60)
+        
+        # Sweep once over busy intervals sorted by start
+        busy_intervals = sorted(
+            ((event['start'].timestamp() - origin) / 60, (event['end'].timestamp() - origin) / 60)
+            for event in events
+        )
+        next_busy = 0
+        available_slots = []
+        
+        for slot_start in range(start_min, end_min - duration_minutes + 1, duration_minutes):
+            slot_end = slot_start + duration_minutes
             
-            # Convert events to our format
-            formatted_events = []
-            for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                end = event['end'].get('dateTime', event['end'].get('date'))
-                
-                # Convert to datetime objects
-                if 'T' in start:  # dateTime format
-                    start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
-                    end_dt = datetime.fromisoformat(end.replace('Z', '+00:00'))
-                    
-                    # Convert to local timezone
-                    start_dt = start_dt.astimezone(tz)
-                    end_dt = end_dt.astimezone(tz)
-                    
-                    formatted_events.append({
-                        'start': start_dt,
-                        'end': end_dt,
-                        'summary': event.get('summary', 'Busy')
-                    })
+            # Intervals ending by this slot's start can't overlap it or any later slot
+            while next_busy < len(busy_intervals) and busy_intervals[next_busy][1] <= slot_start:
+                next_busy += 1
             
-            return formatted_events
+            # The earliest-starting remaining interval decides whether the slot overlaps
+            if next_busy == len(busy_intervals) or busy_intervals[next_busy][0] >= slot_end:
+                available_slots.append(f"{_format_minutes(slot_start)}-{_format_minutes(slot_end)}")
+        
+        return available_slots
+    
+    def _get_events_for_date(self, date: str, timezone: str) -> List[Dict]:
+        """Get busy intervals for a specific date"""
+        tz = _tz(timezone)
+        day = parse_ymd(date)
+        
+        # Start and end of the day
+        day_start = datetime.combine(day, datetime.min.time(), tzinfo=tz)
+        day_end = datetime.combine(day, datetime.max.time(), tzinfo=tz)
+        
+        return self._get_busy_intervals(day_start, day_end, tz)
+    
+    def _get_busy_intervals(self, time_min: datetime, time_max: datetime, tz) -> List[Dict]:
+        """Get busy {'start', 'end'} intervals between two times from the freebusy API"""
+        try:
+            freebusy_result = self.service.freebusy().query(body={
+                'timeMin': time_min.isoformat(),
+                'timeMax': time_max.isoformat(),
+                'items': [{'id': self.calendar_id}]
+            }).execute()
+            
+            busy = freebusy_result['calendars'].get(self.calendar_id, {}).get('busy', [])
+            
+            # Convert to local-timezone datetimes
+            return [
+                {
+                    'start': datetime.fromisoformat(interval['start'].replace('Z', '+00:00')).astimezone(tz),
+                    'end': datetime.fromisoformat(interval['end'].replace('Z', '+00:00')).astimezone(tz)
+                }
+                for interval in busy
+            ]
             
         except HttpError as e:
             print(f"Error fetching calendar events: {e}")
@@ -214,8 +194,7 @@ class GoogleCalendarIntegration:
         """
         try:
             # Validate date is not in the past
-            from datetime import datetime, date as dt_date
-            requested_date = datetime.strptime(date, '%Y-%m-%d').date()
+            requested_date = parse_ymd(date)
             today = datetime.now().date()
             
             if requested_date < today:
@@ -235,18 +214,11 @@ class GoogleCalendarIntegration:
                     'message': 'Invalid time format'
                 }
             
-            tz = pytz.timezone(timezone)
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
+            tz = _tz(timezone)
             
             # Create datetime objects
-            start_dt = tz.localize(datetime.combine(
-                date_obj.date(),
-                datetime.strptime(start_time_str, '%H:%M').time()
-            ))
-            end_dt = tz.localize(datetime.combine(
-                date_obj.date(),
-                datetime.strptime(end_time_str, '%H:%M').time()
-            ))
+            start_dt = datetime.combine(requested_date, _parse_hm(start_time_str), tzinfo=tz)
+            end_dt = datetime.combine(requested_date, _parse_hm(end_time_str), tzinfo=tz)
             
             # Double-check slot is still available before booking
             duration = int((end_dt - start_dt).total_seconds() / 60)
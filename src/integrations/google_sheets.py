@@ -1,21 +1,76 @@
 """Google Sheets integration for customer data storage"""
 
+import atexit
 import os
-import pickle
+import threading
+import time
+import weakref
 from datetime import datetime
-from typing import List, Dict, Optional
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from itertools import repeat
+from typing import List, Dict, Optional, Tuple
 from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
 
+from .google_auth import get_service
+
 load_dotenv()
 
 # Scopes for Google Sheets API
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
+# Customer rows are appended in batches: a row waits until this many are queued
+# or for at most this many seconds, whichever comes first
+BATCH_SIZE = 25
+FLUSH_INTERVAL = 5.0
+
+# Sheet headers per business type
+_BASE_HEADERS = ('Timestamp', 'Name', 'Phone', 'Appointment Date', 'Appointment Time')
+
+_BUSINESS_HEADERS: Dict[str, Tuple[str, ...]] = {
+    'dentist': _BASE_HEADERS + ('Date of Birth', 'Insurance Provider', 'Emergency Contact', 'Notes'),
+    'doctor': _BASE_HEADERS + ('Date of Birth', 'Reason for Visit', 'Insurance Provider', 'Medications', 'Allergies', 'Emergency Contact'),
+    'salon': _BASE_HEADERS + ('Preferred Service', 'Hair Type', 'Previous Services', 'Allergies', 'Notes'),
+    'spa': _BASE_HEADERS + ('Preferred Service', 'Health Conditions', 'Allergies', 'Preferences', 'Notes'),
+    'lawyer': _BASE_HEADERS + ('Case Type', 'Case Details', 'Urgency', 'Preferred Contact Method'),
+    'generic': _BASE_HEADERS + ('Service Type', 'Notes')
+}
+
+# Customer fields written after the base columns, in row order
+_ADDITIONAL_FIELDS = (
+    'date_of_birth', 'insurance_provider', 'emergency_contact', 'notes',
+    'reason_for_visit', 'medications', 'allergies', 'preferred_service',
+    'hair_type', 'previous_services', 'health_conditions', 'preferences',
+    'case_type', 'case_details', 'urgency', 'preferred_contact_method',
+    'service_type'
+)
+
+# Characters ignored when comparing phone numbers
+_PHONE_PUNCTUATION = str.maketrans('', '', ' -.()+')
+
+# Live integrations, so rows still queued at interpreter exit get sent
+_instances: "weakref.WeakSet[GoogleSheetsIntegration]" = weakref.WeakSet()
+
+@atexit.register
+def _flush_all():
+    """Append rows still queued on any live integration"""
+    for sheets in list(_instances):
+        sheets.flush()
+
+def _normalize_phone(phone: str) -> str:
+    """Strip formatting so '(555) 123-4567' and '555.123.4567' compare equal"""
+    return phone.translate(_PHONE_PUNCTUATION)
+
+def _column_index(headers: List[str], name: str) -> int:
+    """Position of a header, or -1 if the sheet doesn't have it"""
+    try:
+        return headers.index(name)
+    except ValueError:
+        return -1
+
+def _cell(row: List[str], column: int) -> str:
+    """Value at a column, treating missing columns and short rows as empty"""
+    return row[column] if 0 <= column < len(row) else ''
+
 class GoogleSheetsIntegration:
     """Google Sheets integration for customer data management"""
     
@@ -23,39 +78,30 @@ class GoogleSheetsIntegration:
         self.sheet_id = sheet_id or os.getenv('GOOGLE_SHEETS_ID')
         self.credentials_file = credentials_file or os.getenv('GOOGLE_CREDENTIALS_FILE')
         self.service = None
+        self._pending_rows: List[List[str]] = []
+        self._last_flush = 0.0
+        self._flush_timer: Optional[threading.Timer] = None
+        # _lock guards the queue and history cache; _send_lock serializes requests to the
+        # sheet so the network round-trip happens without holding _lock
+        self._lock = threading.Lock()
+        self._send_lock = threading.RLock()
+        
+        # Customer history, fetched on first lookup and indexed by phone/name
+        self._history: Optional[List[List[str]]] = None
+        self._history_headers: List[str] = []
+        self._phone_column = -1
+        self._name_column = -1
+        self._phone_index: Dict[str, List[int]] = {}
+        self._name_index: Dict[str, List[int]] = {}
+        
         self._authenticate()
+        _instances.add(self)
     
     def _authenticate(self):
         """Authenticate with Google Sheets API"""
-        creds = None
-        token_file = 'sheets_token.pickle'
-        
-        # Load existing token
-        if os.path.exists(token_file):
-            with open(token_file, 'rb') as token:
-                creds = pickle.load(token)
-        
-        # If no valid credentials, get new ones
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                if not self.credentials_file or not os.path.exists(self.credentials_file):
-                    raise ValueError(
-                        "Google credentials file not found. "
-                        "Please download credentials.json from Google Cloud Console"
-                    )
-                
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_file, SCOPES
-                )
-                creds = flow.run_local_server(port=8080)
-            
-            # Save credentials for next run
-            with open(token_file, 'wb') as token:
-                pickle.dump(creds, token)
-        
-        self.service = build('sheets', 'v4', credentials=creds)
+        self.service = get_service(
+            'sheets', 'v4', self.credentials_file, 'sheets_token.json', tuple(SCOPES)
+        )
         print("✅ Google Sheets authenticated successfully")
     
     def setup_customer_sheet(self, business_type: str = "generic") -> bool:
@@ -82,6 +128,10 @@ class GoogleSheetsIntegration:
                 body=body
             ).execute()
             
+            # Headers changed, so any cached history is stale
+            with self._lock:
+                self._history = None
+            
             print(f"✅ Customer sheet setup complete for {business_type}")
             return True
             
@@ -91,18 +141,7 @@ class GoogleSheetsIntegration:
     
     def _get_headers_for_business_type(self, business_type: str) -> List[str]:
         """Get appropriate headers based on business type"""
-        base_headers = ['Timestamp', 'Name', 'Phone', 'Appointment Date', 'Appointment Time']
-        
-        business_headers = {
-            'dentist': base_headers + ['Date of Birth', 'Insurance Provider', 'Emergency Contact', 'Notes'],
-            'doctor': base_headers + ['Date of Birth', 'Reason for Visit', 'Insurance Provider', 'Medications', 'Allergies', 'Emergency Contact'],
-            'salon': base_headers + ['Preferred Service', 'Hair Type', 'Previous Services', 'Allergies', 'Notes'],
-            'spa': base_headers + ['Preferred Service', 'Health Conditions', 'Allergies', 'Preferences', 'Notes'],
-            'lawyer': base_headers + ['Case Type', 'Case Details', 'Urgency', 'Preferred Contact Method'],
-            'generic': base_headers + ['Service Type', 'Notes']
-        }
-        
-        return business_headers.get(business_type, business_headers['generic'])
+        return list(_BUSINESS_HEADERS.get(business_type, _BUSINESS_HEADERS['generic']))
     
     def store_customer_data(self, customer_info: Dict, appointment_details: Dict = None) -> bool:
         """Store customer information in Google Sheets"""
@@ -124,71 +163,147 @@ class GoogleSheetsIntegration:
             ]
             
             # Add business-specific fields
-            additional_fields = [
-                'date_of_birth', 'insurance_provider', 'emergency_contact', 'notes',
-                'reason_for_visit', 'medications', 'allergies', 'preferred_service',
-                'hair_type', 'previous_services', 'health_conditions', 'preferences',
-                'case_type', 'case_details', 'urgency', 'preferred_contact_method',
-                'service_type'
-            ]
-            
-            for field in additional_fields:
-                row_data.append(customer_info.get(field, ''))
-            
-            # Append to sheet
-            body = {
-                'values': [row_data]
-            }
-            
-            self.service.spreadsheets().values().append(
-                spreadsheetId=self.sheet_id,
-                range='A:Z',
-                valueInputOption='RAW',
-                insertDataOption='INSERT_ROWS',
-                body=body
-            ).execute()
+            row_data.extend(map(customer_info.get, _ADDITIONAL_FIELDS, repeat('')))
             
-            print("✅ Customer data stored in Google Sheets")
+            # Queue the row; append once the batch is full or the last append is old enough,
+            # otherwise make sure a timer sends it within FLUSH_INTERVAL
+            with self._lock:
+                self._pending_rows.append(row_data)
+                if self._history is not None:
+                    self._index_history_row(row_data)
+                send_now = (len(self._pending_rows) >= BATCH_SIZE or
+                            time.monotonic() - self._last_flush >= FLUSH_INTERVAL)
+                if not send_now:
+                    self._schedule_flush()
+            if send_now:
+                self.flush()
             return True
             
         except HttpError as e:
             print(f"⚠️ Failed to store customer data: {e}")
             return True  # Don't fail the booking if sheets fails
     
+    def flush(self) -> bool:
+        """Append any queued customer rows to the sheet in a single request"""
+        with self._send_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self._pending_rows:
+                    return True
+                rows, self._pending_rows = self._pending_rows, []
+                self._last_flush = time.monotonic()
+            
+            try:
+                self.service.spreadsheets().values().append(
+                    spreadsheetId=self.sheet_id,
+                    range='A:Z',
+                    valueInputOption='RAW',
+                    insertDataOption='INSERT_ROWS',
+                    body={'values': rows}
+                ).execute()
+                
+            except Exception as e:
+                # Keep the rows, ahead of anything queued since, and retry on the next timer
+                with self._lock:
+                    self._pending_rows[:0] = rows
+                    self._schedule_flush()
+                print(f"⚠️ Failed to store customer data ({len(rows)} row(s) kept for retry): {e}")
+                return False
+            
+            print(f"✅ Customer data stored in Google Sheets ({len(rows)} row(s))")
+            return True
+    
+    def _schedule_flush(self):
+        """Start the flush timer if one isn't already pending; caller must hold the lock"""
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(FLUSH_INTERVAL, self._timed_flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def _timed_flush(self):
+        """Timer callback that appends whatever is still queued"""
+        with self._lock:
+            if self._flush_timer is threading.current_thread():
+                self._flush_timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            # Nothing else would see an error raised in the timer thread
+            print(f"⚠️ Timed flush of customer data failed: {e}")
+    
     def get_customer_history(self, phone: str = None, name: str = None) -> List[Dict]:
         """Get customer history from sheets"""
         try:
             if not self.sheet_id:
                 return []
             
-            # Read all data
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.sheet_id,
-                range='A:Z'
-            ).execute()
-            
-            values = result.get('values', [])
-            if not values or len(values) < 2:
-                return []
-            
-            headers = values[0]
-            rows = values[1:]
+            # Read the sheet once; later bookings are added to the cached index
+            if self._history is None:
+                self._load_history()
             
-            # Filter by phone or name
-            matching_records = []
-            for row in rows:
-                if len(row) < len(headers):
-                    row.extend([''] * (len(headers) - len(row)))
+            with self._lock:
+                if self._history is None:
+                    # setup_customer_sheet dropped the cache while it was loading
+                    return []
                 
-                record = dict(zip(headers, row))
+                positions = set()
+                if phone:
+                    positions.update(self._phone_index.get(_normalize_phone(phone), ()))
+                if name:
+                    positions.update(self._name_index.get(name.lower().strip(), ()))
                 
-                if phone and record.get('Phone', '').strip() == phone.strip():
-                    matching_records.append(record)
-                elif name and record.get('Name', '').lower().strip() == name.lower().strip():
-                    matching_records.append(record)
-            
-            return matching_records
+                return [self._history_record(self._history[i]) for i in sorted(positions)]
             
         except HttpError as e:
             print(f"Error getting customer history: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def _load_history(self):
+        """Fetch every sheet row and index it by phone and name"""
+        # Holding the send lock keeps appends from landing between the flush and the read
+        with self._send_lock:
+            if self._history is not None:
+                return  # Loaded by another caller while we waited
+            
+            # Make sure queued rows are visible to the read
+            self.flush()
+            
+            result = self.service.spreadsheets().values().get(
+                spreadsheetId=self.sheet_id,
+                range='A:Z'
+            ).execute()
+            
+            values = result.get('values', [])
+            with self._lock:
+                self._history_headers = values[0] if values else []
+                self._phone_column = _column_index(self._history_headers, 'Phone')
+                self._name_column = _column_index(self._history_headers, 'Name')
+                self._history = []
+                self._phone_index = {}
+                self._name_index = {}
+                for row in values[1:]:
+                    self._index_history_row(row)
+                # Rows still queued after a failed append aren't in the sheet yet
+                for row in self._pending_rows:
+                    self._index_history_row(row)
+    
+    def _index_history_row(self, row: List[str]):
+        """Add one raw sheet row to the cached history and lookup indexes"""
+        position = len(self._history)
+        self._history.append(row)
+        
+        phone = _normalize_phone(_cell(row, self._phone_column))
+        if phone:
+            self._phone_index.setdefault(phone, []).append(position)
+        name = _cell(row, self._name_column).lower().strip()
+        if name:
+            self._name_index.setdefault(name, []).append(position)
+    
+    def _history_record(self, row: List[str]) -> Dict:
+        """Build the header-keyed record for a matching row"""
+        headers = self._history_headers
+        if len(row) < len(headers):
+            row = row + [''] * (len(headers) - len(row))
+        return dict(zip(headers, row))
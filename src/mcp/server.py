@@ -1,14 +1,27 @@
 """MCP Server implementation for Universal Appointment Agent"""
 
 import asyncio
-import json
+import logging
 import os
-from typing import Any, Dict, List, Optional
+import stat
+import sys
+from contextlib import asynccontextmanager, redirect_stdout
+from functools import wraps
+from typing import Any, Dict, List, Optional, Sequence
+
+import anyio
+import orjson
+from pydantic import BaseModel, ValidationError
 
 from mcp.server import Server, NotificationOptions
 from mcp.server.models import InitializationOptions
 from mcp.server.stdio import stdio_server
+from mcp.shared.message import SessionMessage
 from mcp.types import (
+    JSONRPCError,
+    JSONRPCMessage,
+    JSONRPCRequest,
+    JSONRPCResponse,
     Resource,
     Tool,
     TextContent,
@@ -18,59 +31,224 @@ from mcp.types import (
 )
 
 from ..core.agent import UniversalAppointmentAgent
+from ..utils.datetime_parser import parse_ymd
 from ..config.business_config import BusinessConfig, create_dental_config, create_salon_config, create_doctor_config
 from .tools_definitions import APPOINTMENT_TOOLS
 
+logger = logging.getLogger(__name__)
+
+# MCP clients are programs; only pretty-print responses when debugging by hand
+PRETTY = os.getenv("MCP_PRETTY_JSON") == "1"
+_DUMPS_OPTION = orjson.OPT_INDENT_2 if PRETTY else None
+
+def _dumps(obj: Any) -> str:
+    """Serialize a tool result to JSON text"""
+    return orjson.dumps(obj, option=_DUMPS_OPTION).decode()
+
+# Most tool calls allowed to run at once; later calls wait for a free slot
+WORKERS = int(os.getenv("MCP_WORKERS", "8"))
+
+class ConfigureBusinessArgs(BaseModel):
+    """Validated arguments for the configure_business tool"""
+    business_type: str
+    business_name: str
+    assistant_name: str
+    services: List[str]
+    working_hours: Dict[str, Optional[str]]
+    appointment_duration: int = 60
+    timezone: str = "America/New_York"
+    calendar_id: str = "primary"
+    sheet_id: Optional[str] = None
+
+class ChatBatchArgs(BaseModel):
+    """Validated arguments for the chat_batch tool"""
+    messages: List[str]
+    session_id: str = "default"
+
+# Checked up front so a misconfigured call is rejected without raising
+_CONFIGURE_REQUIRED = ("business_type", "business_name", "assistant_name", "services", "working_hours")
+
+def _ensure_dict(value: Any) -> Any:
+    """Decode a nested object some clients send as a JSON string"""
+    if isinstance(value, (bytes, str)):
+        return orjson.loads(value)
+    return value
+
+def _static_response(obj: Dict[str, Any]) -> List[TextContent]:
+    """Encode a fixed response once so early returns can share it"""
+    return [TextContent.model_construct(type="text", text=_dumps(obj))]
+
+# Early-return responses for calls made before configure_business (treated as read-only)
+_NOT_CONFIGURED_HINT = _static_response({
+    "success": False,
+    "error": "Agent not configured. Please configure business first using 'configure_business' tool."
+})
+_NOT_CONFIGURED = _static_response({
+    "success": False,
+    "error": "Agent not configured"
+})
+_NOT_CONFIGURED_INFO = _static_response({
+    "configured": False,
+    "message": "No business configured"
+})
+
+def requires_agent(response: List[TextContent] = _NOT_CONFIGURED):
+    """Return the shared `response` instead of running the handler until an agent is configured"""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(self, arguments: Dict[str, Any]) -> List[TextContent]:
+            if self.agent is None:
+                return response
+            return await handler(self, arguments)
+        return wrapper
+    return decorator
+
+def _conversation_summary(status: Dict[str, Any]) -> Dict[str, Any]:
+    """Conversation status fields reported alongside each agent reply"""
+    return {
+        "stage": status["status"],
+        "context": status["context"],
+        "appointment_booked": status["appointment_booked"],
+        "missing_fields": status.get("missing_fields", [])
+    }
+
+# Largest single JSON-RPC line accepted from stdin
+_STDIN_LINE_LIMIT = 16 * 1024 * 1024
+# How long to wait at stdin EOF for responses to requests already read
+_EOF_DRAIN_TIMEOUT = 5.0
+
+@asynccontextmanager
+async def _pipe_stdio_server():
+    """stdio transport that reads and writes the pipes on the event loop instead of worker threads"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=_STDIN_LINE_LIMIT)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+    writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+    
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+    
+    # Request ids still awaiting a response, so EOF doesn't close the session under them
+    in_flight = set()
+    drained = anyio.Event()
+    
+    async def stdin_reader():
+        try:
+            async with read_stream_writer:
+                while line := await reader.readline():
+                    try:
+                        message = JSONRPCMessage.model_validate_json(line)
+                    except Exception as exc:
+                        await read_stream_writer.send(exc)
+                        continue
+                    if isinstance(message.root, JSONRPCRequest):
+                        in_flight.add(message.root.id)
+                    await read_stream_writer.send(SessionMessage(message))
+                
+                if in_flight:
+                    with anyio.move_on_after(_EOF_DRAIN_TIMEOUT):
+                        await drained.wait()
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+    
+    async def stdout_writer():
+        try:
+            async with write_stream_reader:
+                async for session_message in write_stream_reader:
+                    message = session_message.message.root
+                    data = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
+                    writer.write(data.encode() + b"\n")
+                    await writer.drain()
+                    
+                    if isinstance(message, (JSONRPCResponse, JSONRPCError)):
+                        in_flight.discard(message.id)
+                        if not in_flight and reader.at_eof():
+                            drained.set()
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+    
+    # The transport leaves stdout non-blocking and owns the JSON-RPC stream, so
+    # print() calls elsewhere go to stderr instead of failing or corrupting it
+    with redirect_stdout(sys.stderr):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(stdin_reader)
+            tg.start_soon(stdout_writer)
+            yield read_stream, write_stream
+
+def _is_pipe_like(fd: int) -> bool:
+    """Whether the event loop's pipe transports can attach to this fd"""
+    mode = os.fstat(fd).st_mode
+    return stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or stat.S_ISCHR(mode)
+
+def _use_pipe_transport() -> bool:
+    """Whether the event loop can take over stdio without affecting stderr"""
+    stdout = sys.stdout.fileno()
+    # Windows loops cannot attach to console handles, and no loop can attach to a regular file.
+    # When stderr is stdout's pipe (2>&1), the write transport would make it non-blocking too
+    # and the print() calls redirected there could fail with BlockingIOError
+    return (sys.platform != "win32"
+            and _is_pipe_like(sys.stdin.fileno())
+            and _is_pipe_like(stdout)
+            and not os.path.sameopenfile(stdout, sys.stderr.fileno()))
+
+def _stdio_transport():
+    """Use the pipe transport where the event loop can attach to stdio, else the SDK's threaded one"""
+    if _use_pipe_transport():
+        return _pipe_stdio_server()
+    return stdio_server()
+
 class UniversalAppointmentMCPServer:
     """MCP Server for Universal Appointment Agent"""
     
     def __init__(self):
         self.server = Server("universal-appointment-agent")
         self.agent: Optional[UniversalAppointmentAgent] = None
+        self._call_slots = asyncio.Semaphore(WORKERS)
+        # Responses derived only from the business config, rebuilt after configure_business
+        self._info_cache: Optional[List[TextContent]] = None
+        self._status_cache: Optional[Dict[str, Any]] = None
         self.setup_handlers()
-        print("Universal Appointment Agent MCP Server initialized")
+        logger.info("Universal Appointment Agent MCP Server initialized")
     
     def setup_handlers(self):
         """Setup MCP server request handlers"""
         
-        # Store reference to self for handlers
-        server_instance = self
+        # Tool name -> bound handler, built once so dispatch is a single lookup
+        self._dispatch = {
+            "configure_business": self._configure_business,
+            "chat_with_agent": self._chat_with_agent,
+            "chat_batch": self._chat_batch,
+            "check_availability": self._check_availability,
+            "book_appointment_direct": self._book_appointment_direct,
+            "get_agent_status": self._get_agent_status,
+            "get_conversation_status": self._get_conversation_status,
+            "reset_conversation": self._reset_conversation,
+            "cancel_appointment": self._cancel_appointment,
+            "get_business_info": self._get_business_info,
+        }
         
-        async def handle_list_tools() -> List[Tool]:
-            """Return available MCP tools"""
+        async def handle_list_tools() -> Sequence[Tool]:
+            """Return available MCP tools (a shared, immutable tuple)"""
             return APPOINTMENT_TOOLS
         
         async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
             """Handle MCP tool calls"""
             
             try:
-                print(f"Handling tool call: {name}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Handling tool call: %s", name)
                 
-                if name == "configure_business":
-                    return await server_instance._configure_business(arguments)
-                elif name == "chat_with_agent":
-                    return await server_instance._chat_with_agent(arguments)
-                elif name == "check_availability":
-                    return await server_instance._check_availability(arguments)
-                elif name == "book_appointment_direct":
-                    return await server_instance._book_appointment_direct(arguments)
-                elif name == "get_agent_status":
-                    return await server_instance._get_agent_status(arguments)
-                elif name == "get_conversation_status":
-                    return await server_instance._get_conversation_status(arguments)
-                elif name == "reset_conversation":
-                    return await server_instance._reset_conversation(arguments)
-                elif name == "cancel_appointment":
-                    return await server_instance._cancel_appointment(arguments)
-                elif name == "get_business_info":
-                    return await server_instance._get_business_info(arguments)
-                else:
-                    return [TextContent(type="text", text=f"Unknown tool: {name}")]
+                handler = self._dispatch.get(name)
+                if handler is None:
+                    return [TextContent.model_construct(type="text", text=f"Unknown tool: {name}")]
+                async with self._call_slots:
+                    return await handler(arguments)
                     
             except Exception as e:
                 error_msg = f"Error executing tool '{name}': {str(e)}"
-                print(f"Tool execution error: {error_msg}")
-                return [TextContent(type="text", text=error_msg)]
+                logger.error("Tool execution error: %s", error_msg)
+                return [TextContent.model_construct(type="text", text=error_msg)]
         
         # Store handlers for the server to use
         self._handle_list_tools = handle_list_tools
@@ -78,22 +256,29 @@ class UniversalAppointmentMCPServer:
     
     async def _configure_business(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """Configure the appointment agent for a specific business"""
+        missing = [field for field in _CONFIGURE_REQUIRED if field not in arguments]
+        if missing:
+            return [TextContent.model_construct(
+                type="text",
+                text=_dumps({
+                    "success": False,
+                    "error": f"Missing required fields: {', '.join(missing)}",
+                    "message": "Failed to configure agent"
+                })
+            )]
+        
         try:
-            # Create business configuration
-            config = BusinessConfig(
-                business_type=arguments["business_type"],
-                business_name=arguments["business_name"],
-                assistant_name=arguments["assistant_name"],
-                services=arguments["services"],
-                working_hours=arguments["working_hours"],
-                appointment_duration=arguments.get("appointment_duration", 60),
-                timezone=arguments.get("timezone", "America/New_York"),
-                calendar_id=arguments.get("calendar_id", "primary"),
-                sheet_id=arguments.get("sheet_id")
-            )
+            # Validate arguments and create business configuration in one pass
+            args = ConfigureBusinessArgs.model_validate(arguments)
+            config = BusinessConfig(**args.model_dump())
             
-            # Initialize the agent
-            self.agent = UniversalAppointmentAgent(config)
+            # Initialize the agent, letting the one it replaces finish its Sheets writes first
+            agent = UniversalAppointmentAgent(config)
+            if self.agent:
+                await self.agent.aclose()
+            self.agent = agent
+            self._info_cache = None
+            self._status_cache = None
             
             result = {
                 "success": True,
@@ -108,9 +293,9 @@ class UniversalAppointmentMCPServer:
                 }
             }
             
-            return [TextContent(
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps(result, indent=2)
+                text=_dumps(result)
             )]
             
         except Exception as e:
@@ -119,47 +304,31 @@ class UniversalAppointmentMCPServer:
                 "error": str(e),
                 "message": "Failed to configure agent"
             }
-            return [TextContent(
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps(error_result, indent=2)
+                text=_dumps(error_result)
             )]
     
+    @requires_agent(_NOT_CONFIGURED_HINT)
     async def _chat_with_agent(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """Have a conversation with the appointment agent"""
-        if not self.agent:
-            return [TextContent(
-                type="text",
-                text=json.dumps({
-                    "success": False,
-                    "error": "Agent not configured. Please configure business first using 'configure_business' tool."
-                })
-            )]
-        
         try:
             message = arguments["message"]
             session_id = arguments.get("session_id", "default")
             
-            # Process message through the agent
-            response = await self.agent.process_message(message, session_id)
-            
-            # Get conversation status for additional context
-            status = self.agent.get_conversation_status(session_id)
+            # Process message through the agent; the status comes back with the response
+            response, status = await self.agent.process_message_with_status(message, session_id)
             
             result = {
                 "success": True,
                 "response": response,
-                "conversation_status": {
-                    "stage": status["status"],
-                    "context": status["context"],
-                    "appointment_booked": status["appointment_booked"],
-                    "missing_fields": status.get("missing_fields", [])
-                },
+                "conversation_status": _conversation_summary(status),
                 "session_id": session_id
             }
             
-            return [TextContent(
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps(result, indent=2)
+                text=_dumps(result)
             )]
             
         except Exception as e:
@@ -168,30 +337,67 @@ class UniversalAppointmentMCPServer:
                 "error": str(e),
                 "message": "Failed to process conversation"
             }
-            return [TextContent(
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps(error_result, indent=2)
+                text=_dumps(error_result)
             )]
     
-    async def _check_availability(self, arguments: Dict[str, Any]) -> List[TextContent]:
-        """Check available appointment slots"""
-        if not self.agent:
-            return [TextContent(
+    @requires_agent(_NOT_CONFIGURED_HINT)
+    async def _chat_batch(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        """Run several messages through one conversation in a single call"""
+        # Reject a bare string or non-string items before any turn runs
+        try:
+            args = ChatBatchArgs.model_validate(arguments)
+        except ValidationError as e:
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps({
+                text=_dumps({
                     "success": False,
-                    "error": "Agent not configured"
+                    "error": f"Invalid chat_batch arguments: {e.errors(include_url=False)}",
+                    "message": "Failed to process conversation batch"
                 })
             )]
         
+        session_id = args.session_id
+        responses = []
+        try:
+            for message in args.messages:
+                response, status = await self.agent.process_message_with_status(message, session_id)
+                responses.append({
+                    "message": message,
+                    "response": response,
+                    "conversation_status": _conversation_summary(status)
+                })
+            
+            result = {
+                "success": True,
+                "responses": responses,
+                "session_id": session_id
+            }
+            
+        except Exception as e:
+            # Replies already produced are kept so the caller knows where the batch stopped
+            result = {
+                "success": False,
+                "error": str(e),
+                "responses": responses,
+                "message": "Failed to process conversation batch"
+            }
+        
+        return [TextContent.model_construct(
+            type="text",
+            text=_dumps(result)
+        )]
+    
+    @requires_agent()
+    async def _check_availability(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        """Check available appointment slots"""
         try:
             date = arguments["date"]
             duration = arguments.get("duration", self.agent.config.appointment_duration)
             
             # Get working hours for the date
-            from datetime import datetime
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            working_hours = self.agent.config.get_working_hours_for_date(date_obj)
+            working_hours = self.agent.config.get_working_hours_for_date(parse_ymd(date))
             
             if not working_hours:
                 result = {
@@ -213,9 +419,9 @@ class UniversalAppointmentMCPServer:
                     "message": f"Found {len(slots)} available slots for {date}"
                 }
             
-            return [TextContent(
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps(result, indent=2)
+                text=_dumps(result)
             )]
             
         except Exception as e:
@@ -224,26 +430,18 @@ class UniversalAppointmentMCPServer:
                 "error": str(e),
                 "message": "Failed to check availability"
             }
-            return [TextContent(
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps(error_result, indent=2)
+                text=_dumps(error_result)
             )]
     
+    @requires_agent()
     async def _book_appointment_direct(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """Book appointment directly without conversation"""
-        if not self.agent:
-            return [TextContent(
-                type="text",
-                text=json.dumps({
-                    "success": False,
-                    "error": "Agent not configured"
-                })
-            )]
-        
         try:
             date = arguments["date"]
             time_slot = arguments["time_slot"]
-            customer_info = arguments["customer_info"]
+            customer_info = _ensure_dict(arguments["customer_info"])
             summary = arguments.get("summary")
             
             # Book the appointment
@@ -256,16 +454,15 @@ class UniversalAppointmentMCPServer:
             )
             
             if booking_result["success"]:
-                # Store customer data if sheets is configured
-                if self.agent.sheets:
-                    self.agent.sheets.store_customer_data(
-                        customer_info,
-                        {"date": date, "time": time_slot}
-                    )
+                # Store customer data off the response path if sheets is configured
+                self.agent.store_customer_data_in_background(
+                    customer_info,
+                    {"date": date, "time": time_slot}
+                )
             
-            return [TextContent(
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps(booking_result, indent=2)
+                text=_dumps(booking_result)
             )]
             
         except Exception as e:
@@ -274,9 +471,9 @@ class UniversalAppointmentMCPServer:
                 "error": str(e),
                 "message": "Failed to book appointment"
             }
-            return [TextContent(
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps(error_result, indent=2)
+                text=_dumps(error_result)
             )]
     
     async def _get_agent_status(self, arguments: Dict[str, Any]) -> List[TextContent]:
@@ -287,55 +484,45 @@ class UniversalAppointmentMCPServer:
                 "message": "Agent not configured"
             }
         else:
+            if self._status_cache is None:
+                self._status_cache = {
+                    "configured": True,
+                    "business_type": self.agent.config.business_type,
+                    "business_name": self.agent.config.business_name,
+                    "assistant_name": self.agent.config.assistant_name,
+                    "services": self.agent.config.services,
+                    "working_hours": self.agent.config.working_hours,
+                    "appointment_duration": self.agent.config.appointment_duration,
+                    "timezone": self.agent.config.timezone,
+                    "calendar_integration": True
+                }
+            
+            # Sheets is set up lazily; report it without triggering OAuth and the header rewrite
             result = {
-                "configured": True,
-                "business_type": self.agent.config.business_type,
-                "business_name": self.agent.config.business_name,
-                "assistant_name": self.agent.config.assistant_name,
-                "services": self.agent.config.services,
-                "working_hours": self.agent.config.working_hours,
-                "appointment_duration": self.agent.config.appointment_duration,
-                "timezone": self.agent.config.timezone,
-                "calendar_integration": True,
-                "sheets_integration": self.agent.sheets is not None,
-                "active_conversations": len(self.agent.conversation_manager.contexts)
+                **self._status_cache,
+                "sheets_integration": self.agent.sheets_enabled,
+                "active_conversations": len(self.agent.conversation_manager.store)
             }
         
-        return [TextContent(
+        return [TextContent.model_construct(
             type="text",
-            text=json.dumps(result, indent=2)
+            text=_dumps(result)
         )]
     
+    @requires_agent()
     async def _get_conversation_status(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """Get conversation status for a session"""
-        if not self.agent:
-            return [TextContent(
-                type="text",
-                text=json.dumps({
-                    "success": False,
-                    "error": "Agent not configured"
-                })
-            )]
-        
         session_id = arguments.get("session_id", "default")
         status = self.agent.get_conversation_status(session_id)
         
-        return [TextContent(
+        return [TextContent.model_construct(
             type="text",
-            text=json.dumps(status, indent=2)
+            text=_dumps(status)
         )]
     
+    @requires_agent()
     async def _reset_conversation(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """Reset conversation session"""
-        if not self.agent:
-            return [TextContent(
-                type="text",
-                text=json.dumps({
-                    "success": False,
-                    "error": "Agent not configured"
-                })
-            )]
-        
         session_id = arguments.get("session_id", "default")
         self.agent.reset_conversation(session_id)
         
@@ -344,29 +531,21 @@ class UniversalAppointmentMCPServer:
             "message": f"Conversation reset for session: {session_id}"
         }
         
-        return [TextContent(
+        return [TextContent.model_construct(
             type="text",
-            text=json.dumps(result, indent=2)
+            text=_dumps(result)
         )]
     
+    @requires_agent()
     async def _cancel_appointment(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """Cancel an appointment"""
-        if not self.agent:
-            return [TextContent(
-                type="text",
-                text=json.dumps({
-                    "success": False,
-                    "error": "Agent not configured"
-                })
-            )]
-        
         try:
             event_id = arguments["event_id"]
             result = self.agent.calendar.cancel_appointment(event_id)
             
-            return [TextContent(
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps(result, indent=2)
+                text=_dumps(result)
             )]
             
         except Exception as e:
@@ -375,60 +554,57 @@ class UniversalAppointmentMCPServer:
                 "error": str(e),
                 "message": "Failed to cancel appointment"
             }
-            return [TextContent(
+            return [TextContent.model_construct(
                 type="text",
-                text=json.dumps(error_result, indent=2)
+                text=_dumps(error_result)
             )]
     
+    @requires_agent(_NOT_CONFIGURED_INFO)
     async def _get_business_info(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """Get business information"""
-        if not self.agent:
-            return [TextContent(
-                type="text",
-                text=json.dumps({
-                    "configured": False,
-                    "message": "No business configured"
-                })
-            )]
-        
-        config = self.agent.config
-        info = {
-            "business_type": config.business_type,
-            "business_name": config.business_name,
-            "assistant_name": config.assistant_name,
-            "services": config.services,
-            "working_hours": config.working_hours,
-            "appointment_duration": config.appointment_duration,
-            "timezone": config.timezone,
-            "greeting": config.get_greeting()
-        }
+        if self._info_cache is None:
+            config = self.agent.config
+            self._info_cache = _static_response({
+                "business_type": config.business_type,
+                "business_name": config.business_name,
+                "assistant_name": config.assistant_name,
+                "services": config.services,
+                "working_hours": config.working_hours,
+                "appointment_duration": config.appointment_duration,
+                "timezone": config.timezone,
+                "greeting": config.get_greeting()
+            })
         
-        return [TextContent(
-            type="text",
-            text=json.dumps(info, indent=2)
-        )]
+        return self._info_cache
     
     async def run(self):
         """Run the MCP server"""
-        async with stdio_server() as (read_stream, write_stream):
-            await self.server.run(
-                read_stream,
-                write_stream,
-                InitializationOptions(
-                    server_name="universal-appointment-agent",
-                    server_version="1.0.0",
-                    capabilities=self.server.get_capabilities(
-                        notification_options=NotificationOptions(),
-                        experimental_capabilities={},
+        try:
+            async with _stdio_transport() as (read_stream, write_stream):
+                await self.server.run(
+                    read_stream,
+                    write_stream,
+                    InitializationOptions(
+                        server_name="universal-appointment-agent",
+                        server_version="1.0.0",
+                        capabilities=self.server.get_capabilities(
+                            notification_options=NotificationOptions(),
+                            experimental_capabilities={},
+                        ),
                     ),
-                ),
-            )
+                )
+        finally:
+            # Let any background Sheets writes finish before exiting
+            if self.agent:
+                await self.agent.aclose()
 
 # Entry point for running the server
 async def main():
     """Main entry point for MCP server"""
-    print("🚀 Starting Universal Appointment Agent MCP Server...")
-    print("Ready for Coral Protocol integration!")
+    # Logs go to stderr; stdout carries the JSON-RPC stream
+    logging.basicConfig(level=os.getenv("MCP_LOG_LEVEL", "WARNING").upper())
+    logger.info("🚀 Starting Universal Appointment Agent MCP Server...")
+    logger.info("Ready for Coral Protocol integration!")
     
     server = UniversalAppointmentMCPServer()
     await server.run()
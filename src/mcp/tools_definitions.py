@@ -2,8 +2,17 @@
 
 from mcp.types import Tool
 
-# MCP Tools for Coral Protocol integration
-APPOINTMENT_TOOLS = [
+# Sub-schemas shared between tool definitions
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_DAY_HOURS_PROP = {"type": "string", "description": "Hours in HH:MM-HH:MM format or empty for closed"}
+_NO_ARGS_SCHEMA = {"type": "object", "properties": {}}
+
+def _session_id_prop(description: str) -> dict:
+    """Session ID property with the shared type and default"""
+    return {"type": "string", "default": "default", "description": description}
+
+# MCP Tools for Coral Protocol integration; a tuple so list_tools can hand out the same object every call
+APPOINTMENT_TOOLS = (
     Tool(
         name="configure_business",
         description="Configure the appointment agent for a specific business type and settings",
@@ -30,16 +39,8 @@ APPOINTMENT_TOOLS = [
                 },
                 "working_hours": {
                     "type": "object",
-                    "properties": {
-                        "monday": {"type": "string", "description": "Hours in HH:MM-HH:MM format or empty for closed"},
-                        "tuesday": {"type": "string", "description": "Hours in HH:MM-HH:MM format or empty for closed"},
-                        "wednesday": {"type": "string", "description": "Hours in HH:MM-HH:MM format or empty for closed"},
-                        "thursday": {"type": "string", "description": "Hours in HH:MM-HH:MM format or empty for closed"},
-                        "friday": {"type": "string", "description": "Hours in HH:MM-HH:MM format or empty for closed"},
-                        "saturday": {"type": "string", "description": "Hours in HH:MM-HH:MM format or empty for closed"},
-                        "sunday": {"type": "string", "description": "Hours in HH:MM-HH:MM format or empty for closed"}
-                    },
-                    "required": ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"],
+                    "properties": dict.fromkeys(_WEEKDAYS, _DAY_HOURS_PROP),
+                    "required": list(_WEEKDAYS),
                     "description": "Working hours for each day of the week"
                 },
                 "appointment_duration": {
@@ -76,16 +77,29 @@ APPOINTMENT_TOOLS = [
                     "type": "string",
                     "description": "The user's message to the appointment agent"
                 },
-                "session_id": {
-                    "type": "string",
-                    "default": "default",
-                    "description": "Session ID to maintain conversation context across messages"
-                }
+                "session_id": _session_id_prop("Session ID to maintain conversation context across messages")
             },
             "required": ["message"]
         }
     ),
     
+    Tool(
+        name="chat_batch",
+        description="Send several messages to the appointment agent in order and get every reply in one call",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "messages": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "The user's messages, processed in order within one conversation"
+                },
+                "session_id": _session_id_prop("Session ID to maintain conversation context across messages")
+            },
+            "required": ["messages"]
+        }
+    ),
+    
     Tool(
         name="check_availability",
         description="Check available appointment slots for a specific date",
@@ -145,10 +159,7 @@ APPOINTMENT_TOOLS = [
     Tool(
         name="get_agent_status",
         description="Get current agent configuration and status",
-        inputSchema={
-            "type": "object",
-            "properties": {}
-        }
+        inputSchema=_NO_ARGS_SCHEMA
     ),
     
     Tool(
@@ -157,11 +168,7 @@ APPOINTMENT_TOOLS = [
         inputSchema={
             "type": "object",
             "properties": {
-                "session_id": {
-                    "type": "string",
-                    "default": "default",
-                    "description": "Session ID to check"
-                }
+                "session_id": _session_id_prop("Session ID to check")
             }
         }
     ),
@@ -172,11 +179,7 @@ APPOINTMENT_TOOLS = [
         inputSchema={
             "type": "object",
             "properties": {
-                "session_id": {
-                    "type": "string",
-                    "default": "default",
-                    "description": "Session ID to reset"
-                }
+                "session_id": _session_id_prop("Session ID to reset")
             }
         }
     ),
@@ -199,9 +202,6 @@ APPOINTMENT_TOOLS = [
     Tool(
         name="get_business_info",
         description="Get information about the currently configured business",
-        inputSchema={
-            "type": "object",
-            "properties": {}
-        }
+        inputSchema=_NO_ARGS_SCHEMA
     )
-]
\ No newline at end of file
+)
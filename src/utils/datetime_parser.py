@@ -1,25 +1,191 @@
 """Natural language date and time parsing utilities"""
 
 import re
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Tuple
+from datetime import date as date_type, datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, List, Optional, Dict, Tuple
 from dateutil import parser as date_parser
-import pytz
+from dateutil.relativedelta import relativedelta
+from zoneinfo import ZoneInfo
+
+# Day-part words and the time each one stands for
+_TIME_KEYWORDS = {
+    "morning": "09:00",
+    "afternoon": "14:00",
+    "evening": "18:00",
+    "noon": "12:00",
+    "midnight": "00:00"
+}
+# All clock-time formats in one pattern: 3:30pm / 15:30 and 3pm
+_TIME_RE = re.compile(
+    r'(?P<hour>\d{1,2})(?::(?P<minute>\d{2})\s*(?P<period>am|pm)?|\s*(?P<bare_period>am|pm))'
+)
+_DATE_SLASH_RE = re.compile(r'(\d{1,2})/(\d{1,2})(?:/(\d{4}|\d{2}))?')
+# dateutil can only succeed on text with a digit or a month name; skip it otherwise
+_DATEUTIL_HINT = re.compile(r'\d|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec', re.IGNORECASE)
+
+# Relative day words and their offset from the reference day
+_REL_DAYS = {"today": 0, "tomorrow": 1, "yesterday": -1}
+
+# Day names and the abbreviations accepted for them, matched as whole words
+_DAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6, "mon": 0, "tue": 1, "tues": 1,
+    "wed": 2, "thu": 3, "thur": 3, "thurs": 3, "fri": 4, "sat": 5, "sun": 6
+}
+_WORD_RE = re.compile(r'[a-z]+')
+
+# One pass over a message finds date-like and time-like spans; only those reach the parsers
+_WEEKDAY = r'(?:mon|tues?|wed(?:nes)?|thu(?:rs?)?|fri|sat(?:ur)?|sun)(?:day)?'
+_MONTH = r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?'
+_DATETIME_SCAN = re.compile(
+    r'\b(?:(?P<date>today|tomorrow|yesterday|next\s+week'
+    r'|(?:next\s+)?' + _WEEKDAY +
+    r'|\d{1,2}/\d{1,2}(?:/\d{2,4})?'
+    r'|\d{4}-\d{1,2}-\d{1,2}'
+    r'|' + _MONTH + r'\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s+\d{4})?'
+    r'|\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?' + _MONTH + r'(?:,?\s+\d{4})?)'
+    r'|(?P<time>\d{1,2}(?::\d{2})?\s*(?:am|pm)|\d{1,2}:\d{2}|morning|afternoon|evening|noon|midnight))\b',
+    re.IGNORECASE
+)
+
+@lru_cache(maxsize=16)
+def _get_tz(name: str) -> ZoneInfo:
+    """Timezone object for a name, shared by every parser using it"""
+    # zoneinfo's C implementation makes now(tz) several times cheaper than pytz
+    return ZoneInfo(name)
+
+# YYYY-MM-DD formatter bound once; the unbound date method also formats datetimes as just their date
+_ymd = date_type.isoformat
+
+@lru_cache(maxsize=1024)
+def parse_ymd(value: str) -> date_type:
+    """Parse a YYYY-MM-DD string, caching repeated dates"""
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def _days_ahead(day_num: int, today_weekday: int, is_next: bool) -> int:
+    """Days until the named weekday; today and 'next' both roll to the following week"""
+    days = day_num - today_weekday
+    if days <= 0 or is_next:
+        days += 7
+    return days
+
+@lru_cache(maxsize=1024)
+def _parse_date_cached(text: str, reference: date_type, fuzzy: bool) -> Optional[str]:
+    """Parse normalized date text relative to a reference day"""
+    # Handle relative dates
+    offset = _REL_DAYS.get(text)
+    if offset is not None:
+        return _ymd(reference + timedelta(days=offset))
+    if "next week" in text:
+        return _ymd(reference + timedelta(weeks=1))
+    
+    # Handle day names (this week or next week)
+    tokens = _WORD_RE.findall(text)
+    for token in tokens:
+        day_num = _DAYS.get(token)
+        if day_num is not None:
+            days_ahead = _days_ahead(day_num, reference.weekday(), "next" in tokens)
+            return _ymd(reference + timedelta(days=days_ahead))
+    
+    # Handle common formats
+    slash_match = _DATE_SLASH_RE.fullmatch(text)
+    if slash_match:
+        return _parse_slash_date(slash_match, reference)
+    
+    if not _DATEUTIL_HINT.search(text):
+        return None
+    
+    # Try to parse with dateutil, filling missing fields from the reference day rather than the clock
+    try:
+        default = datetime(reference.year, reference.month, reference.day)
+        parsed_date = date_parser.parse(text, fuzzy=fuzzy, default=default)
+        if parsed_date.date() < reference:
+            # Without a year, a date already past this year means next year's, as for M/D;
+            # re-parsing with next year as the default only moves dates whose year was left out
+            parsed_date = date_parser.parse(text, fuzzy=fuzzy, default=default + relativedelta(years=1))
+        return _ymd(parsed_date)
+    except (ValueError, TypeError, OverflowError):
+        # dateutil's ParserError is a ValueError
+        return None
+
+def _parse_slash_date(match: re.Match, reference: date_type) -> Optional[str]:
+    """Build a date from M/D[/YY[YY]] parts the way dateutil reads them"""
+    first, second, year_text = match.groups()
+    month, day = int(first), int(second)
+    if month > 12 and day <= 12 and year_text is not None:
+        # Not a valid month, so dateutil reads a full date day-first
+        month, day = day, month
+    
+    if year_text is None:
+        year = reference.year
+    else:
+        year = int(year_text)
+        if len(year_text) == 2:
+            # Two-digit years land within 50 years of the reference, as in dateutil
+            year += reference.year // 100 * 100
+            if year >= reference.year + 50:
+                year -= 100
+            elif year < reference.year - 50:
+                year += 100
+    
+    try:
+        parsed = date_type(year, month, day)
+        if year_text is None and parsed < reference:
+            # Without a year, a date already past this year means next year's
+            parsed = parsed.replace(year=year + 1)
+    except ValueError:
+        return None
+    return _ymd(parsed)
+
+@lru_cache(maxsize=1024)
+def _parse_time_cached(text: str) -> Optional[str]:
+    """Parse normalized time text"""
+    # Plain 24-hour HH:MM needs no regex
+    if len(text) == 5 and text[2] == ':' and text[:2].isdecimal() and text[3:].isdecimal():
+        hour, minute = int(text[:2]), int(text[3:])
+        if hour <= 23 and minute <= 59:
+            return f"{hour:02d}:{minute:02d}"
+    
+    # Handle relative times
+    for keyword, time_value in _TIME_KEYWORDS.items():
+        if keyword in text:
+            return time_value
+    
+    # Handle specific times; the first usable match in the text wins
+    for match in _TIME_RE.finditer(text):
+        hour = int(match['hour'])
+        minute = int(match['minute'] or 0)
+        period = match['period'] or match['bare_period']
+        
+        if period:  # H am/pm or HH:MM am/pm
+            if period == 'pm' and hour != 12:
+                hour += 12
+            elif period == 'am' and hour == 12:
+                hour = 0
+            
+            return f"{hour:02d}:{minute:02d}"
+        
+        if hour <= 23 and minute <= 59:  # HH:MM 24-hour
+            return f"{hour:02d}:{minute:02d}"
+    
+    return None
 
 class DateTimeParser:
     """Parse natural language dates and times"""
     
     def __init__(self, timezone: str = "America/New_York"):
         self.timezone = timezone
-        self.tz = pytz.timezone(timezone)
+        self.tz = _get_tz(timezone)
     
-    def parse_date(self, text: str, reference_date: datetime = None) -> Optional[str]:
+    def parse_date(self, text: str, reference_date: datetime = None, fuzzy: bool = False) -> Optional[str]:
         """
         Parse natural language date to YYYY-MM-DD format
         
         Args:
             text: Natural language date text
             reference_date: Reference date for relative parsing
+            fuzzy: Let dateutil skip unknown words around the date
             
         Returns:
             Date string in YYYY-MM-DD format or None
@@ -30,50 +196,24 @@ class DateTimeParser:
         text = text.lower().strip()
         
         if reference_date is None:
-            reference_date = datetime.now(self.tz)
+            reference_date = datetime.now(self.tz).date()
+        elif isinstance(reference_date, datetime):
+            reference_date = reference_date.date()
         
-        # Handle relative dates
-        if text in ["today"]:
-            return reference_date.strftime("%Y-%m-%d")
-        elif text in ["tomorrow"]:
-            return (reference_date + timedelta(days=1)).strftime("%Y-%m-%d")
-        elif text in ["yesterday"]:
-            return (reference_date - timedelta(days=1)).strftime("%Y-%m-%d")
-        elif "next week" in text:
-            return (reference_date + timedelta(weeks=1)).strftime("%Y-%m-%d")
-        
-        # Handle day names (this week or next week)
-        days = {
-            "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
-            "friday": 4, "saturday": 5, "sunday": 6, "mon": 0, "tue": 1, 
-            "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6
-        }
-        
-        for day_name, day_num in days.items():
-            if day_name in text:
-                days_ahead = day_num - reference_date.weekday()
-                if days_ahead <= 0 or "next" in text:
-                    days_ahead += 7
-                target_date = reference_date + timedelta(days=days_ahead)
-                return target_date.strftime("%Y-%m-%d")
-        
-        # Try to parse with dateutil
-        try:
-            # Handle common formats
-            if re.match(r'\d{1,2}/\d{1,2}(/\d{4})?', text):
-                parsed_date = date_parser.parse(text)
-                if parsed_date.year == 1900:  # Default year from dateutil
-                    parsed_date = parsed_date.replace(year=reference_date.year)
-                    if parsed_date < reference_date:
-                        parsed_date = parsed_date.replace(year=reference_date.year + 1)
-                return parsed_date.strftime("%Y-%m-%d")
-            else:
-                parsed_date = date_parser.parse(text, fuzzy=True)
-                return parsed_date.strftime("%Y-%m-%d")
-        except:
-            pass
+        return _parse_date_cached(text, reference_date, fuzzy)
+    
+    def parse_dates(self, texts: Iterable[str], reference_date: datetime = None) -> List[Optional[str]]:
+        """Parse many date strings against one reference day, parsing each distinct string once"""
+        if reference_date is None:
+            reference_date = datetime.now(self.tz).date()
         
-        return None
+        parsed: Dict[str, Optional[str]] = {}
+        results = []
+        for text in texts:
+            if text not in parsed:
+                parsed[text] = self.parse_date(text, reference_date)
+            results.append(parsed[text])
+        return results
     
     def parse_time(self, text: str) -> Optional[str]:
         """
@@ -90,67 +230,15 @@ class DateTimeParser:
             
         text = text.lower().strip()
         
-        # Handle relative times
-        time_mappings = {
-            "morning": "09:00",
-            "afternoon": "14:00", 
-            "evening": "18:00",
-            "noon": "12:00",
-            "midnight": "00:00"
-        }
-        
-        for keyword, time_value in time_mappings.items():
-            if keyword in text:
-                return time_value
-        
-        # Handle specific times with regex patterns
-        time_patterns = [
-            r'(\d{1,2}):(\d{2})\s*(am|pm)?',  # 3:30pm, 15:30
-            r'(\d{1,2})\s*(am|pm)',          # 3pm, 3am
-            r'(\d{1,2}):(\d{2})',            # 24-hour format
-        ]
-        
-        for pattern in time_patterns:
-            match = re.search(pattern, text)
-            if match:
-                groups = match.groups()
-                
-                if len(groups) == 3 and groups[2]:  # HH:MM am/pm
-                    hour, minute, period = groups
-                    hour = int(hour)
-                    minute = int(minute)
-                    
-                    if period == 'pm' and hour != 12:
-                        hour += 12
-                    elif period == 'am' and hour == 12:
-                        hour = 0
-                    
-                    return f"{hour:02d}:{minute:02d}"
-                
-                elif len(groups) == 2 and groups[1] in ['am', 'pm']:  # H am/pm
-                    hour = int(groups[0])
-                    period = groups[1]
-                    
-                    if period == 'pm' and hour != 12:
-                        hour += 12
-                    elif period == 'am' and hour == 12:
-                        hour = 0
-                    
-                    return f"{hour:02d}:00"
-                
-                elif len(groups) == 2 and groups[1].isdigit():  # HH:MM 24-hour
-                    hour, minute = int(groups[0]), int(groups[1])
-                    if 0 <= hour <= 23 and 0 <= minute <= 59:
-                        return f"{hour:02d}:{minute:02d}"
-        
-        return None
+        return _parse_time_cached(text)
     
-    def extract_datetime_info(self, text: str) -> Dict[str, Optional[str]]:
+    def extract_datetime_info(self, text: str, reference_date: datetime = None) -> Dict[str, Optional[str]]:
         """
         Extract date and time information from natural language text
         
         Args:
             text: Natural language text containing date/time info
+            reference_date: Reference date for relative dates (defaults to today)
             
         Returns:
             Dictionary with 'date', 'time', and 'original_text'
@@ -161,30 +249,21 @@ class DateTimeParser:
             'original_text': text
         }
         
-        # Look for dates in the text
-        words = text.split()
-        for i in range(len(words)):
-            # Try single words and combinations
-            for length in [1, 2, 3]:
-                if i + length <= len(words):
-                    candidate = ' '.join(words[i:i+length])
-                    parsed_date = self.parse_date(candidate)
-                    if parsed_date:
-                        result['date'] = parsed_date
-                        break
-            if result['date']:
-                break
+        # Read the clock at most once, and only if the message has a date span
+        if isinstance(reference_date, datetime):
+            reference_date = reference_date.date()
         
-        # Look for times in the text
-        for i in range(len(words)):
-            for length in [1, 2, 3]:
-                if i + length <= len(words):
-                    candidate = ' '.join(words[i:i+length])
-                    parsed_time = self.parse_time(candidate)
-                    if parsed_time:
-                        result['time'] = parsed_time
-                        break
-            if result['time']:
+        # Scan once; the first parseable date span and time span win
+        for match in _DATETIME_SCAN.finditer(text):
+            if match.lastgroup == 'date':
+                if result['date'] is None:
+                    if reference_date is None:
+                        reference_date = datetime.now(self.tz).date()
+                    result['date'] = self.parse_date(match.group(), reference_date)
+            elif result['time'] is None:
+                result['time'] = self.parse_time(match.group())
+            
+            if result['date'] and result['time']:
                 break
         
         return result
\ No newline at end of file
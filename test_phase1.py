@@ -15,7 +15,8 @@ def test_mistral_connection():
     print("Testing Mistral AI Connection...")
     
     try:
-        from src.config.ai_config import mistral_config
+        from src.config.ai_config import get_mistral_config
+        mistral_config = get_mistral_config()
         
         # Test simple completion
         messages = [
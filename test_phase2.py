@@ -7,6 +7,7 @@ sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 import os
 from datetime import datetime, timedelta
+from itertools import islice
 from src.integrations.google_calendar import GoogleCalendarIntegration
 from src.integrations.google_sheets import GoogleSheetsIntegration
 from src.config.business_config import create_dental_config
@@ -35,7 +36,7 @@ def test_google_calendar():
         print(f"✅ Calendar connected - Found {len(slots)} available slots for {tomorrow}")
         
         if slots:
-            print(f"   Sample slots: {slots[:3]}")
+            print(f"   Sample slots: {list(islice(slots, 3))}")
         
         return True
         
@@ -3,12 +3,17 @@
 
 import sys
 import asyncio
+import copy
+from datetime import date, datetime, timedelta
+from itertools import islice
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from src.core.agent import UniversalAppointmentAgent
 from src.config.business_config import create_dental_config, create_salon_config
-from src.config.ai_config import mistral_config
+from src.config.ai_config import get_mistral_config
+from src.core.conversation_manager import ConversationManager, InMemoryContextStore
+from src.utils.datetime_parser import DateTimeParser
 
 def test_agent_initialization():
     """Test agent initialization"""
@@ -84,7 +89,6 @@ async def test_real_booking():
         agent = UniversalAppointmentAgent(config)
         
         # Get tomorrow's date
-        from datetime import datetime, timedelta
         tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
         
         # Get available slots
@@ -94,7 +98,7 @@ async def test_real_booking():
             print(f"⚠️ No available slots found for {tomorrow}")
             return True
         
-        print(f"Available slots for {tomorrow}: {slots[:3]}")
+        print(f"Available slots for {tomorrow}: {list(islice(slots, 3))}")
         
         # Book a real test appointment (don't cancel)
         test_customer = {
@@ -143,8 +147,6 @@ async def test_datetime_parsing():
     print("\nTesting DateTime Parsing...")
     
     try:
-        from src.utils.datetime_parser import DateTimeParser
-        
         parser = DateTimeParser()
         
         # Test date parsing
@@ -171,6 +173,88 @@ async def test_datetime_parsing():
         print(f"❌ DateTime parsing test failed: {e}")
         return False
 
+def test_date_parsing_rules():
+    """Test date parsing rules against a fixed reference day"""
+    print("\nTesting Date Parsing Rules...")
+    
+    parser = DateTimeParser()
+    reference = date(2025, 6, 11)  # a Wednesday
+    
+    # Relative days and day names
+    assert parser.parse_date("tomorrow", reference) == "2025-06-12"
+    assert parser.parse_date("friday", reference) == "2025-06-13"
+    assert parser.parse_date("next friday", reference) == "2025-06-20"
+    assert parser.parse_date("wednesday", reference) == "2025-06-18"
+    
+    # M/D without a year: still-ahead dates stay this year, passed ones roll to next year
+    assert parser.parse_date("12/25", reference) == "2025-12-25"
+    assert parser.parse_date("6/11", reference) == "2025-06-11"
+    assert parser.parse_date("6/10", reference) == "2026-06-10"
+    assert parser.parse_date("3/1", reference) == "2026-03-01"
+    # With a year: day-first when the month is out of range, two-digit years near the reference
+    assert parser.parse_date("12/25/2024", reference) == "2024-12-25"
+    assert parser.parse_date("25/12/2024", reference) == "2024-12-25"
+    assert parser.parse_date("1/2/30", reference) == "2030-01-02"
+    assert parser.parse_date("13/45", reference) is None
+    
+    # Month names take missing fields from the reference day and roll over like M/D
+    assert parser.parse_date("December 25th", reference) == "2025-12-25"
+    assert parser.parse_date("june 11", reference) == "2025-06-11"
+    assert parser.parse_date("june 10", reference) == parser.parse_date("6/10", reference) == "2026-06-10"
+    assert parser.parse_date("10 june", reference) == "2026-06-10"
+    assert parser.parse_date("March 15th, 1985", reference) == "1985-03-15"
+    assert parser.parse_date("june 10 2025", reference) == "2025-06-10"
+    
+    # Surrounding words are only skipped when fuzzy parsing is asked for
+    assert parser.parse_date("December 25th please", reference) is None
+    assert parser.parse_date("December 25th please", reference, fuzzy=True) == "2025-12-25"
+    assert parser.parse_date("the 15th", reference) is None
+    assert parser.parse_date("the 15th", reference, fuzzy=True) == "2025-06-15"
+    assert parser.parse_date("garbage", reference) is None
+    
+    # Bulk parsing keeps input order, repeats and failures, and agrees with parse_date
+    texts = ["tomorrow", "6/10", "garbage", "tomorrow", "next friday"]
+    assert parser.parse_dates(texts, reference) == [
+        "2025-06-12", "2026-06-10", None, "2025-06-12", "2025-06-20"
+    ]
+    assert parser.parse_dates(texts, reference) == [parser.parse_date(t, reference) for t in texts]
+    assert parser.parse_dates([], reference) == []
+    
+    print("✅ Date parsing rules hold")
+    return True
+
+def test_datetime_extraction():
+    """Test which parts of a message are read as dates and times"""
+    print("\nTesting DateTime Extraction...")
+    
+    parser = DateTimeParser()
+    reference = date(2025, 6, 11)  # a Wednesday
+    
+    def extract(text):
+        info = parser.extract_datetime_info(text, reference)
+        return info['date'], info['time']
+    
+    # Date and time spans anywhere in the message
+    assert extract("I need an appointment tomorrow at 3pm") == ("2025-06-12", "15:00")
+    assert extract("Tomorrow afternoon would be great") == ("2025-06-12", "14:00")
+    assert extract("next friday afternoon") == ("2025-06-20", "14:00")
+    assert extract("How about 12/25 at 10:30am") == ("2025-12-25", "10:30")
+    assert extract("I'm free 2025-07-04 15:30") == ("2025-07-04", "15:30")
+    assert extract("Can I come in on the 15th of March?") == ("2026-03-15", None)
+    assert extract("June 10 at 9am?") == extract("6/10 at 9am?") == ("2026-06-10", "09:00")
+    
+    # The first date and the first time win
+    assert extract("monday or tuesday at noon") == ("2025-06-16", "12:00")
+    
+    # A time alone, or a phone number or name, does not produce a date
+    assert extract("3pm sounds good") == (None, "15:00")
+    assert extract("call me at 555-123-4567") == (None, None)
+    assert extract("My name is John Test") == (None, None)
+    assert extract("thanks!") == (None, None)
+    
+    print("✅ DateTime extraction picks the expected spans")
+    return True
+
 def test_business_configurations():
     """Test different business configurations"""
     print("\nTesting Business Configurations...")
@@ -202,6 +286,7 @@ async def test_mistral_integration():
     print("\nTesting Mistral Integration...")
     
     try:
+        mistral_config = get_mistral_config()
         if not mistral_config:
             print("⚠️ Mistral not configured - skipping AI tests")
             return True
@@ -229,8 +314,6 @@ def test_conversation_management():
     print("\nTesting Conversation Management...")
     
     try:
-        from src.core.conversation_manager import ConversationManager
-        
         manager = ConversationManager()
         
         # Create context
@@ -259,6 +342,66 @@ def test_conversation_management():
         print(f"❌ Conversation management test failed: {e}")
         return False
 
+class _CopyingContextStore:
+    """ContextStore that hands out copies, like a store that serializes contexts"""
+    
+    def __init__(self):
+        self.saved = {}
+    
+    def get(self, session_id):
+        context = self.saved.get(session_id)
+        return copy.deepcopy(context) if context is not None else None
+    
+    def put(self, session_id, context):
+        self.saved[session_id] = copy.deepcopy(context)
+    
+    def delete(self, session_id):
+        self.saved.pop(session_id, None)
+    
+    def __len__(self):
+        return len(self.saved)
+
+def test_context_store():
+    """Test pluggable context stores and LRU eviction"""
+    print("\nTesting Context Store...")
+    
+    # A copying store only sees changes once they are saved
+    store = _CopyingContextStore()
+    manager = ConversationManager(store=store)
+    context = manager.get_or_create_context("store_session", "dentist", ["name", "phone"])
+    context.add_message("user", "Hi, I need an appointment")
+    context.requested_date = "2030-03-15"
+    assert len(manager.get_context("store_session").messages) == 0
+    
+    # The prompt is built from the live context, before it is saved
+    prompt = manager.get_context_for_prompt(context)
+    assert "user: Hi, I need an appointment" in prompt, prompt
+    assert "2030-03-15" in prompt, prompt
+    
+    manager.save_context(context)
+    assert manager.get_context("store_session").requested_date == "2030-03-15"
+    assert len(store) == 1
+    manager.reset_context("store_session")
+    assert manager.get_context("store_session") is None
+    assert len(store) == 0
+    print("   ✅ Custom store: saves, reloads and resets contexts")
+    
+    # The in-memory store evicts the least recently used session
+    lru = InMemoryContextStore(max_sessions=2)
+    manager = ConversationManager(store=lru)
+    for session_id in ("a", "b"):
+        manager.get_or_create_context(session_id, "dentist", ["name"])
+    manager.get_context("a")  # touch "a" so "b" is now the oldest
+    manager.get_or_create_context("c", "dentist", ["name"])
+    assert len(lru) == 2
+    assert manager.get_context("b") is None
+    assert manager.get_context("a") is not None
+    assert manager.get_context("c") is not None
+    print("   ✅ In-memory store: evicts the least recently used session")
+    
+    print("✅ Context store working correctly")
+    return True
+
 async def main():
     """Run all Phase 3 tests"""
     print("Phase 3 Testing: Core Agent with Mistral Integration")
@@ -272,8 +415,9 @@ async def main():
             return False
         
         config_ok = test_business_configurations()
-        datetime_ok = await test_datetime_parsing()
-        conversation_ok = test_conversation_management()
+        datetime_ok = (await test_datetime_parsing() and test_date_parsing_rules()
+                       and test_datetime_extraction())
+        conversation_ok = test_conversation_management() and test_context_store()
         mistral_ok = await test_mistral_integration()
         
         # Test complete flow
@@ -286,7 +430,7 @@ async def main():
         
         print("\n" + "="*60)
         
-        if all([config_ok, datetime_ok, conversation_ok, mistral_ok]):
+        if config_ok and datetime_ok and conversation_ok and mistral_ok:
             print("🎉 Phase 3 Complete!")
             print("\nCore Agent Features Working:")
             print("  ✅ Business Configuration: Multiple business types")